@@ -0,0 +1,281 @@
+"""
+Offline benchmark suite for Talon.
+
+Spins up local stand-in services (open TCP listeners, slow HTTP endpoints and
+closed ports) plus a fake Telegram Bot API, then times discovery, a full
+monitor tick, dashboard rendering and alert fan-out at several target counts.
+Nothing leaves the machine.
+
+    python benchmarks/run.py --sizes 10,100,1000,10000 --output bench.json
+
+Results are printed (and optionally written) as JSON so runs from different
+releases can be diffed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+from telegram import Bot
+
+from talon_handler import __version__
+from talon_handler.alerts import AlertAggregator
+from talon_handler.config import ConfigManager
+from talon_handler.dashboard import DashboardRenderer
+from talon_handler.discovery import scan_local_ports
+from talon_handler.targets import Target
+from talon_handler.telegram_bot import OutboundQueue
+
+HOST = "127.0.0.1"
+TOKEN = "123456:BENCHMARK"
+CHAT_ID = 42
+
+def raise_fd_limit():
+    try:
+        import resource
+    except ImportError: # Windows
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+async def _read_request(reader: asyncio.StreamReader):
+    """Reads one HTTP/1.1 request. Returns (method, path, body) or None on EOF."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+    lines = head.decode("latin-1").split("\r\n")
+    method, path = lines[0].split()[:2]
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    body = await reader.readexactly(length) if length else b""
+    return method, path, body
+
+def _response(status: str, body: bytes, content_type: str = "text/plain") -> bytes:
+    return (f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+
+class StandIns:
+    """Local services for the monitored targets: open, slow (HTTP) and closed ports."""
+    def __init__(self, slow_ms: float):
+        self.slow_ms = slow_ms
+        self.servers: List[asyncio.AbstractServer] = []
+
+    async def _accept(self, reader, writer):
+        writer.close()
+
+    async def _slow_http(self, reader, writer):
+        try:
+            while await _read_request(reader) is not None:
+                await asyncio.sleep(self.slow_ms / 1000)
+                writer.write(_response("200 OK", b"ok"))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _listen(self, handler) -> int:
+        server = await asyncio.start_server(handler, HOST, 0)
+        self.servers.append(server)
+        return server.sockets[0].getsockname()[1]
+
+    async def targets(self, size: int) -> List[Target]:
+        """About 80% open TCP, 10% slow HTTP (one server, one path each) and 10% closed."""
+        slow = size // 10
+        closed = size // 10
+        targets = []
+        for i in range(size - slow - closed):
+            targets.append(Target(port=await self._listen(self._accept), name=f"open-{i}"))
+        if slow:
+            port = await self._listen(self._slow_http)
+            targets += [Target(port=port, protocol="http", path=f"/slow/{i}", name=f"slow-{i}") for i in range(slow)]
+        for i in range(closed):
+            with socket.socket() as s:
+                s.bind((HOST, 0))
+                targets.append(Target(port=s.getsockname()[1], name=f"closed-{i}"))
+        return targets
+
+    async def close(self):
+        for server in self.servers:
+            server.close()
+        await asyncio.gather(*(server.wait_closed() for server in self.servers))
+        self.servers.clear()
+
+class FakeTelegramAPI:
+    """Answers getMe and sendMessage like the Bot API and counts what was sent."""
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{HOST}:{self.server.sockets[0].getsockname()[1]}/bot"
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, HOST, 0)
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def _result(self, method: str, body: bytes):
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Talon", "username": "talon_bench_bot"}
+        if method == "sendMessage":
+            params = {k: v[0] for k, v in parse_qs(body.decode()).items()}
+            self.messages += 1
+            self.bytes += len(params.get("text", ""))
+            chat_id = int(params.get("chat_id", CHAT_ID))
+            return {"message_id": self.messages, "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"}, "text": params.get("text", "")}
+        return True
+
+    async def _handle(self, reader, writer):
+        try:
+            while (request := await _read_request(reader)) is not None:
+                _, path, body = request
+                payload = {"ok": True, "result": self._result(path.rsplit("/", 1)[-1], body)}
+                writer.write(_response("200 OK", json.dumps(payload).encode(), "application/json"))
+                await writer.drain()
+        finally:
+            writer.close()
+
+def summarize(name: str, size: int, runs: List[float], **extra) -> Dict:
+    return {"benchmark": name, "size": size, "runs": len(runs), "min_s": min(runs),
+            "median_s": statistics.median(runs), "max_s": max(runs), **extra}
+
+def timed(fn, repeat: int) -> List[float]:
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - started)
+    return runs
+
+async def bench_size(size: int, repeat: int, slow_ms: float, api: FakeTelegramAPI) -> List[Dict]:
+    from talon_handler.monitor import TalonMonitor
+
+    stand_ins = StandIns(slow_ms)
+    targets = await stand_ins.targets(size)
+    results = []
+    try:
+        listening = len(scan_local_ports())
+        results.append(summarize("scan_local_ports", size, timed(scan_local_ports, repeat), ports_seen=listening))
+
+        with open("talon_config.json", "w") as f:
+            json.dump({"targets": [t.to_dict() for t in targets]}, f)
+        ConfigManager._shared.clear()
+        monitor = TalonMonitor()
+        try:
+            # First tick: every target due, cold connections and pools
+            started = time.perf_counter()
+            probes = await monitor.tick()
+            cold = time.perf_counter() - started
+            runs = []
+            for _ in range(repeat):
+                monitor.scheduler.trigger(list(monitor.targets), time.monotonic())
+                started = time.perf_counter()
+                await monitor.tick()
+                runs.append(time.perf_counter() - started)
+            up = sum(r.up for r in monitor.latest.values())
+            results.append(summarize("tick", size, runs, cold_s=cold, probes=probes, up=up))
+
+            def render_changed():
+                monitor.dashboard = DashboardRenderer()
+                monitor.generate_dashboard(monitor.targets.values(), monitor.latest)
+            results.append(summarize("generate_dashboard", size, timed(render_changed, repeat)))
+            results.append(summarize("generate_dashboard_unchanged", size, timed(
+                lambda: monitor.generate_dashboard(monitor.targets.values(), monitor.latest), repeat)))
+        finally:
+            await monitor.prober.close()
+            if monitor.history is not None:
+                monitor.history.close()
+
+        results.append(await bench_fanout(size, repeat, targets, api))
+    finally:
+        await stand_ins.close()
+    return results
+
+async def bench_fanout(size: int, repeat: int, targets: List[Target], api: FakeTelegramAPI) -> Dict:
+    """Every target goes DOWN at once: aggregate, format and deliver through the outbound queue."""
+    bot = Bot(TOKEN, base_url=api.base_url)
+    runs = []
+    async with bot:
+        outbound = OutboundQueue(bot, per_chat_interval=0, global_rate=0)
+        outbound.start()
+        aggregator = AlertAggregator(lambda text: outbound.send(CHAT_ID, text), window=3600)
+        sent_before, bytes_before = api.messages, api.bytes
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for target in targets:
+                aggregator.add_down(target, 3)
+            await aggregator.flush()
+            await outbound.drain()
+            runs.append(time.perf_counter() - started)
+        if aggregator._timer is not None:
+            aggregator._timer.cancel()
+        await outbound.stop()
+    return summarize("alert_fanout", size, runs,
+                     messages=(api.messages - sent_before) // repeat,
+                     message_bytes=(api.bytes - bytes_before) // repeat)
+
+async def run(sizes: List[int], repeat: int, slow_ms: float) -> Dict:
+    api = FakeTelegramAPI()
+    await api.start()
+    results = []
+    try:
+        for size in sizes:
+            print(f"size {size}...", file=sys.stderr)
+            results += await bench_size(size, repeat, slow_ms, api)
+    finally:
+        await api.close()
+    return {
+        "talon_version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "repeat": repeat,
+        "slow_ms": slow_ms,
+        "results": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline Talon benchmarks")
+    parser.add_argument("--sizes", default="10,100,1000,10000", help="Comma-separated target counts")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark")
+    parser.add_argument("--slow-ms", type=float, default=50, help="Response delay of the slow HTTP stand-ins")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    raise_fd_limit()
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    output = os.path.abspath(args.output) if args.output else None
+    cwd = os.getcwd()
+    # Config, history and dashboard files go to a scratch directory
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        try:
+            report = asyncio.run(run(sizes, max(1, args.repeat), args.slow_ms))
+        finally:
+            os.chdir(cwd)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+
+if __name__ == "__main__":
+    main()
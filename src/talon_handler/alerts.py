@@ -0,0 +1,107 @@
+import asyncio
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from .targets import Target
+
+# Telegram rejects messages above 4096 characters
+MAX_MESSAGE_LENGTH = 4000
+
+# kind -> (icon, label) for grouped summaries, in display order
+KINDS = {
+    "down": ("⚠️", "DOWN"),
+    "root": ("⚠️", "DOWN (dependents suppressed)"),
+    "slow": ("🐢", "SLOW"),
+    "recovered": ("✅", "RECOVERED"),
+    "normal": ("✅", "LATENCY OK"),
+}
+# A transition of the key kind cancels still-pending transitions of the value kinds
+_CANCELS = {"recovered": ("down", "root"), "normal": ("slow",)}
+
+Event = Tuple[Target, str] # (target, detail)
+
+class AlertAggregator:
+    """
+    Collects DOWN, SLOW and RECOVERED transitions for `window` seconds and sends
+    them as one summary message, so a host reboot costs one API call instead of
+    one per port. A service that goes down and recovers inside the same window
+    is dropped entirely.
+    """
+    def __init__(self, send: Callable[[str], Awaitable[None]], window: float = 10.0):
+        self.send = send
+        self.window = window
+        self.pending: Dict[str, Dict[str, Event]] = {kind: {} for kind in KINDS}
+        self._timer: Optional[asyncio.Task] = None
+
+    def add(self, kind: str, target: Target, detail: str = ""):
+        cancelled = [self.pending[c].pop(target.key, None) for c in _CANCELS.get(kind, ())]
+        if not any(cancelled):
+            self.pending[kind][target.key] = (target, detail)
+        self._schedule()
+
+    def discard(self, kind: str, key: str) -> bool:
+        """Drops a still-pending transition; True if there was one."""
+        return self.pending[kind].pop(key, None) is not None
+
+    def add_down(self, target: Target, strikes: int):
+        self.add("down", target, str(strikes))
+
+    def add_recovered(self, target: Target):
+        self.add("recovered", target)
+
+    def _schedule(self):
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        """Sends everything collected so far as a single message."""
+        events = {kind: list(pending.values()) for kind, pending in self.pending.items() if pending}
+        for pending in self.pending.values():
+            pending.clear()
+        if events:
+            await self.send(format_summary(events))
+
+def _where(target: Target) -> str:
+    return f"{target.host}:{target.port}"
+
+def _single(kind: str, target: Target, detail: str) -> str:
+    if kind == "down":
+        return f"⚠️ ALERT: Service '{target.name}' on {_where(target)} is DOWN (Strikes: {detail})."
+    if kind == "root":
+        return (f"⚠️ ALERT: Service '{target.name}' on {_where(target)} is DOWN. "
+                f"Alerts for the services that depend on it are suppressed: {detail}.")
+    if kind == "slow":
+        return f"🐢 SLOW: Service '{target.name}' on {_where(target)} is responding slowly ({detail})."
+    if kind == "normal":
+        return f"✅ LATENCY OK: Service '{target.name}' on {_where(target)} is responding normally again."
+    return f"✅ RECOVERED: Service '{target.name}' on {_where(target)} is back UP."
+
+def format_summary(events: Dict[str, List[Event]]) -> str:
+    """Builds the alert text. Single transitions keep the classic one-line wording."""
+    if sum(len(v) for v in events.values()) == 1:
+        kind, [(target, detail)] = next(iter(events.items()))
+        return _single(kind, target, detail)
+
+    sections = []
+    for kind, (icon, label) in KINDS.items():
+        groups: Dict[str, List[Event]] = defaultdict(list)
+        for target, detail in events.get(kind, []):
+            groups[target.host].append((target, detail))
+        for host, group in groups.items():
+            noun = "service" if len(group) == 1 else "services"
+            names = ", ".join(
+                f"{t.name} ({t.port}, {d})" if kind == "slow"
+                else f"{t.name} ({t.port}) → {d}" if kind == "root"
+                else f"{t.name} ({t.port})"
+                for t, d in group
+            )
+            sections.append(f"{icon} {len(group)} {noun} {label} on {host}: {names}")
+
+    text = "\n".join(sections)
+    if len(text) > MAX_MESSAGE_LENGTH:
+        text = text[:MAX_MESSAGE_LENGTH - 1] + "…"
+    return text
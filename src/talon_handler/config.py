@@ -1,47 +1,146 @@
 import json
 import os
 import secrets
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Any, Optional
-from rich.console import Console
-from rich.prompt import Prompt, Confirm
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional, Tuple
 from .constants import CONFIG_FILE
+from .targets import Target, migrate_watchlist
+from .utils import LazyConsole, atomic_write
 
-console = Console()
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+console = LazyConsole()
 
 def generate_otp() -> str:
     """Generates a cryptographically secure 6-digit OTP."""
     return "".join([str(secrets.randbelow(10)) for _ in range(6)])
 
 class ConfigManager:
+    _shared: Dict[Path, "ConfigManager"] = {}
+
     def __init__(self, config_path: str = CONFIG_FILE):
         self.config_path = Path(config_path)
+        self.generation = 0 # bumped on every observed change
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._listeners: List[Callable[["ConfigManager"], None]] = []
         self.data: Dict[str, Any] = self._load()
+        if self._migrate():
+            self.save()
+
+    @classmethod
+    def shared(cls, config_path: str = CONFIG_FILE) -> "ConfigManager":
+        """Returns the process-wide instance for `config_path`, creating it on first use."""
+        key = Path(config_path).resolve()
+        if key not in cls._shared:
+            cls._shared[key] = cls(config_path)
+        return cls._shared[key]
+
+    def _stat_signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = self.config_path.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_ino, st.st_size)
 
-    def _load(self) -> Dict[str, Any]:
+    def _load(self, fallback: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        # Stat before reading: a write racing the read just triggers one more reload
+        self._signature = self._stat_signature()
         if self.config_path.exists():
             try:
                 with open(self.config_path, "r") as f:
                     return json.load(f)
             except Exception as e:
                 console.print(f"[red]Error loading config: {e}[/red]")
+                if fallback is not None:
+                    return fallback
         return {}
 
-    def reload(self):
-        """Reloads data from disk."""
-        self.data = self._load()
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Holds an advisory lock on a sidecar .lock file for the duration of a write."""
+        lock_path = self.config_path.with_name(self.config_path.name + ".lock")
+        with open(lock_path, "a+") as lock:
+            if os.name == 'nt':
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+            else:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if os.name == 'nt':
+                    lock.seek(0)
+                    msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+                else:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _write(self):
+        atomic_write(self.config_path, json.dumps(self.data, indent=4), fsync=True)
+        self._signature = self._stat_signature()
+        self._notify()
+
+    def _migrate(self) -> bool:
+        """Upgrades legacy port-only watchlists to the target model. Returns True if changed."""
+        if "watchlist" not in self.data or "targets" in self.data:
+            return False
+        self.data["targets"] = migrate_watchlist(
+            self.data.pop("watchlist") or {},
+            self.data.pop("service_names", None) or {},
+        )
+        return True
+
+    def reload(self) -> bool:
+        """Reloads data from disk if the file's mtime, inode or size changed. Returns True if it did."""
+        if self._stat_signature() == self._signature:
+            return False
+        # Keep the last good data if the file is somehow unreadable
+        self.data = self._load(fallback=self.data)
+        self._migrate()
+        self._notify()
+        return True
+
+    def subscribe(self, callback: Callable[["ConfigManager"], None]):
+        """Registers a callback invoked after every reload or save that changed the data."""
+        self._listeners.append(callback)
+
+    def _notify(self):
+        self.generation += 1
+        for callback in list(self._listeners):
+            callback(self)
 
     def save(self):
-        with open(self.config_path, "w") as f:
-            json.dump(self.data, f, indent=4)
+        """Atomically replaces the whole file with `self.data`."""
+        with self._locked():
+            self._write()
+
+    def update(self, changes: Dict[str, Any], remove: Iterable[str] = ()):
+        """
+        Read-modify-write of individual keys under the file lock, so concurrent
+        writers (CLI and daemon) never drop each other's updates.
+        """
+        with self._locked():
+            self.data = self._load(fallback=self.data)
+            self._migrate()
+            self.data.update(changes)
+            for key in remove:
+                self.data.pop(key, None)
+            self._write()
 
     def interactive_audit(self):
         """Audits the configuration interactively."""
-        updated_data = {}
+        from rich.prompt import Prompt
         fields = [
             ("telegram_token", "Telegram Bot Token", ""),
             ("monitoring_interval", "Monitoring Interval (seconds)", 60),
         ]
+        # Only audited keys are written back, so a chat_id, OTP or targets the daemon
+        # wrote while the prompts were open are kept
+        changes: Dict[str, Any] = {}
+        removed = []
 
         for key, label, default in fields:
             current_val = self.data.get(key)
@@ -53,33 +152,51 @@ class ConfigManager:
                     default="K"
                 ).upper()
 
-                if action == "K":
-                    updated_data[key] = current_val
-                elif action == "R":
+                if action == "R":
                     new_val = Prompt.ask(f"Enter new value for {label}")
-                    updated_data[key] = new_val.strip("'\"")
-                else:
-                    continue
+                    changes[key] = new_val.strip("'\"")
+                elif action == "S":
+                    removed.append(key)
             else:
                 new_val = Prompt.ask(f"Enter {label}", default=str(default))
-                updated_data[key] = new_val.strip("'\"")
+                changes[key] = new_val.strip("'\"")
 
-        # Always preserve or update core technical state
-        updated_data["watchlist"] = self.data.get("watchlist", {})
-        updated_data["chat_id"] = self.data.get("chat_id")
-        
-        self.data = updated_data
-        self.save()
+        self.update(changes, remove=removed)
 
     def set_otp(self):
         otp = generate_otp()
-        self.data["pending_otp"] = otp
-        self.save()
+        self.update({"pending_otp": otp})
         return otp
 
-    def get_watchlist(self) -> Dict[str, bool]:
-        return self.data.get("watchlist", {})
+    def get_targets(self) -> List[Target]:
+        return [Target.from_dict(t) for t in self.data.get("targets", [])]
+
+    def update_targets(self, targets: List[Target]):
+        self.update({"targets": [t.to_dict() for t in targets]})
+
+    def add_targets(self, targets: Iterable[Target]) -> List[Target]:
+        """
+        Appends the targets that are not watched yet to the list freshly read under
+        the file lock, so targets added by another writer meanwhile are kept.
+        Returns the targets that were actually added.
+        """
+        with self._locked():
+            self.data = self._load(fallback=self.data)
+            self._migrate()
+            known = {t.key for t in self.get_targets()}
+            added = [t for t in targets if t.key not in known]
+            if added:
+                self.data["targets"] = self.data.get("targets", []) + [t.to_dict() for t in added]
+                self._write()
+        return added
 
-    def update_watchlist(self, watchlist: Dict[str, bool]):
-        self.data["watchlist"] = watchlist
-        self.save()
+    def set_enabled(self, states: Dict[str, bool]):
+        """Applies enabled flags by target key to the list freshly read under the file lock."""
+        with self._locked():
+            self.data = self._load(fallback=self.data)
+            self._migrate()
+            for entry in self.data.get("targets", []):
+                key = Target.from_dict(entry).key
+                if key in states:
+                    entry["enabled"] = states[key]
+            self._write()
@@ -23,3 +23,9 @@ COMMON_SERVICES = {
 CONFIG_FILE = "talon_config.json"
 DASHBOARD_FILE = "talon_dashboard.md"
 PID_FILE = "talon.pid"
+DEFAULT_HOST = "127.0.0.1"
+LOCAL_HOSTS = {DEFAULT_HOST, "localhost", "::1"} # hosts that mean "this machine"
+HISTORY_FILE = "talon_history.db"
+LOG_FILE = "talon.log"
+STATS_FILE = "talon_stats.json"
+CONTROL_SOCKET = "talon.sock"
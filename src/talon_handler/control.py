@@ -0,0 +1,47 @@
+import json
+import os
+import socket
+from typing import Any
+from .constants import CONTROL_SOCKET
+
+# Newline-delimited JSON: {"cmd": "status", "args": {...}} -> {"ok": true, "result": ...}
+# The client side lives here and stays light for CLI commands; the daemon side is control_server.py.
+
+class ControlError(Exception):
+    """The daemon answered with an error."""
+
+class ControlUnavailable(ControlError):
+    """No daemon is listening on the control socket."""
+
+def _connect(path: str, timeout: float) -> socket.socket:
+    try:
+        if os.name == 'nt':
+            with open(path, "r") as f:
+                port = int(f.read().strip())
+            return socket.create_connection(("127.0.0.1", port), timeout=timeout)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+    except (OSError, ValueError) as e:
+        raise ControlUnavailable(f"Talon is not running ({e})") from e
+
+def request(cmd: str, timeout: float = 5.0, path: str = CONTROL_SOCKET, **args) -> Any:
+    """Sends one command to the running monitor and returns its result."""
+    with _connect(path, timeout) as sock:
+        try:
+            sock.sendall(json.dumps({"cmd": cmd, "args": args}).encode() + b"\n")
+            with sock.makefile("rb") as f:
+                line = f.readline()
+        except socket.timeout as e:
+            raise ControlError(f"no answer within {timeout:.0f}s") from e
+    if not line:
+        raise ControlError("the daemon closed the connection without answering")
+    reply = json.loads(line)
+    if not reply.get("ok"):
+        raise ControlError(reply.get("error", "unknown error"))
+    return reply.get("result")
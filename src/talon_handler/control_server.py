@@ -0,0 +1,110 @@
+import asyncio
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional
+from .constants import CONTROL_SOCKET
+from .control import ControlError
+from .log import logger
+
+class ControlServer:
+    """
+    Local control channel served from the monitor's event loop: a Unix socket
+    (mode 0600), or a loopback TCP port recorded in the socket file on Windows.
+    `shutdown` replies only once the daemon has finished its graceful stop.
+    """
+    def __init__(self, monitor, request_stop: Callable[[], None], path: str = CONTROL_SOCKET):
+        self.monitor = monitor
+        self.request_stop = request_stop
+        self.path = path
+        self.stopped = asyncio.Event() # set by the owner once shutdown cleanup is done
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.commands: Dict[str, Callable[[Dict], Awaitable[Any]]] = {
+            "status": self._status,
+            "stats": self._stats,
+            "reload": self._reload,
+            "rescan": self._rescan,
+            "pause": self._pause,
+            "resume": self._resume,
+            "shutdown": self._shutdown,
+        }
+
+    async def start(self):
+        if os.name == 'nt':
+            self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+            with open(self.path, "w") as f:
+                f.write(str(self._server.sockets[0].getsockname()[1]))
+        else:
+            self._server = await asyncio.start_unix_server(self._handle, self.path)
+            os.chmod(self.path, 0o600)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            try:
+                request = json.loads(line)
+                handler = self.commands.get(request.get("cmd"))
+                if handler is None:
+                    raise ControlError(f"unknown command {request.get('cmd')!r}")
+                reply = {"ok": True, "result": await handler(request.get("args") or {})}
+            except (ControlError, ValueError, AttributeError) as e:
+                reply = {"ok": False, "error": str(e)}
+            writer.write(json.dumps(reply, default=str).encode() + b"\n")
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _keys(self, args: Dict):
+        ref = args.get("target")
+        if ref is None:
+            return None
+        keys = self.monitor.resolve(str(ref))
+        if not keys:
+            raise ControlError(f"no target matches {ref!r}")
+        return keys
+
+    async def _status(self, args: Dict):
+        return self.monitor.status()
+
+    async def _stats(self, args: Dict):
+        return self.monitor.stats.snapshot()
+
+    async def _reload(self, args: Dict):
+        return {"changed": self.monitor.config.reload(), "targets": len(self.monitor.targets)}
+
+    async def _rescan(self, args: Dict):
+        keys = self._keys(args)
+        self.monitor.probe_now(keys)
+        return {"queued": len(self.monitor.targets) if keys is None else len(keys)}
+
+    async def _pause(self, args: Dict):
+        keys = self._keys(args)
+        if keys is None:
+            raise ControlError("pause needs a target")
+        self.monitor.pause(keys)
+        logger.info(f"Paused {', '.join(keys)}")
+        return {"paused": keys}
+
+    async def _resume(self, args: Dict):
+        keys = self._keys(args)
+        if keys is None:
+            raise ControlError("resume needs a target")
+        self.monitor.resume(keys)
+        logger.info(f"Resumed {', '.join(keys)}")
+        return {"resumed": keys}
+
+    async def _shutdown(self, args: Dict):
+        self.request_stop()
+        await self.stopped.wait()
+        return {"stopped": True}
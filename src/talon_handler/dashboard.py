@@ -0,0 +1,134 @@
+import asyncio
+import bisect
+import time
+import psutil
+from datetime import datetime
+from typing import AbstractSet, Dict, Iterable, Optional, Tuple
+from .constants import DASHBOARD_FILE
+from .history import LATENCY_BUCKETS_MS, Summary
+from .log import logger
+from .probes import ProbeResult
+from .targets import Target
+from .utils import atomic_write
+
+class DashboardRenderer:
+    """
+    Renders the Markdown dashboard only when something visible changed.
+
+    The last rendered state (service statuses plus bucketed vitals) is kept in
+    memory, so ticks without changes cost no disk write. Writes are atomic and
+    can be throttled with `min_interval` seconds between them; a throttled change
+    is written by a timer on the running loop once the interval is over, since
+    the next render() may be a whole (backed-off) probe interval away.
+    """
+    def __init__(self, path: str = DASHBOARD_FILE, min_interval: float = 0.0, vitals_bucket: int = 5):
+        self.path = path
+        self.min_interval = min_interval
+        self.vitals_bucket = max(1, vitals_bucket)
+        self._last_state: Optional[Tuple] = None
+        self._last_write = 0.0
+        self._deferred: Optional[Tuple] = None # render() arguments of a throttled change
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _bucket(self, value: float) -> int:
+        return int(value // self.vitals_bucket)
+
+    def render(self, targets: Iterable[Target], results: Dict[str, ProbeResult],
+               summaries: Optional[Dict[str, Summary]] = None,
+               degraded: AbstractSet[str] = frozenset(),
+               suppressed: Optional[Dict[str, str]] = None) -> bool:
+        """
+        Writes the dashboard if needed. Returns True when the file was rewritten.
+        `suppressed` maps targets skipped because of a down parent to that parent's name.
+        """
+        cpu = psutil.cpu_percent()
+        ram = psutil.virtual_memory().percent
+        targets = list(targets)
+        summaries = summaries or {}
+        suppressed = suppressed or {}
+        rows = []
+        latencies = {}
+        for t in targets:
+            if not t.enabled: continue
+            result = results.get(t.key)
+            if t.key in suppressed:
+                status, result = f"⏭ not probed ({suppressed[t.key]} down)", None
+            elif result is None or not result.up:
+                status = f"❌ DOWN ({result.detail})" if result and result.detail else "❌ DOWN"
+            else:
+                status = "🐢 SLOW" if t.key in degraded else "✅ UP"
+            # Latency is compared by histogram bucket so jitter doesn't force a rewrite
+            latency_ms = result.latency_ms if result and result.up else None
+            latency_bucket = None if latency_ms is None else bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)
+            latencies[t.key] = latency_ms
+            summary = summaries.get(t.key)
+            rows.append((t.key, t.name, t.host, t.port, status, latency_bucket, _percentiles(summary), _uptime(summary)))
+        rows = tuple(rows)
+        state = (self._bucket(cpu), self._bucket(ram), rows)
+        if state == self._last_state:
+            return False
+
+        now = time.monotonic()
+        if self._last_state is not None and now - self._last_write < self.min_interval:
+            self._defer(self.min_interval - (now - self._last_write),
+                        (targets, results, summaries, degraded, suppressed))
+            return False
+
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        lines = [
+            "# 🦅 Talon Handler Dashboard",
+            f"**Last Updated:** `{timestamp}`",
+            "",
+            "## 🚀 System Vitals",
+            f"- **CPU Usage:** `{cpu}%`",
+            f"- **RAM Usage:** `{ram}%`",
+            "",
+            "## 📡 Service Status",
+            "| Service | Host | Port | Status | Latency | p50 / p99 (24h) | Uptime (24h) |",
+            "| :--- | :--- | :--- | :--- | :--- | :--- | :--- |"
+        ]
+        for key, name, host, port, status, _, percentiles, uptime in rows:
+            latency = _ms(latencies[key])
+            lines.append(f"| {name} | {host} | {port} | {status} | {latency} | {percentiles} | {uptime} |")
+
+        atomic_write(self.path, "\n".join(lines))
+        self._last_state = state
+        self._last_write = now
+        self._deferred = None
+        return True
+
+    def _defer(self, delay: float, args: Tuple):
+        self._deferred = args
+        if self._timer is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return # no loop: the next render() call writes it
+        self._timer = loop.call_later(delay, self._flush)
+
+    def _flush(self):
+        self._timer = None
+        args, self._deferred = self._deferred, None
+        if args is None:
+            return
+        try:
+            self.render(*args)
+        except OSError as e:
+            logger.warning(f"Dashboard write failed: {e}")
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+def _uptime(summary: Optional[Summary]) -> str:
+    return f"{summary.uptime:.1f}%" if summary else "-"
+
+def _ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.0f} ms" if value >= 1 else f"{value:.1f} ms"
+
+def _percentiles(summary: Optional[Summary]) -> str:
+    if not summary or summary.p50_ms is None:
+        return "-"
+    return f"≤{summary.p50_ms:.0f} / ≤{summary.p99_ms:.0f} ms"
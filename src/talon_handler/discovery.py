@@ -1,50 +1,301 @@
 import psutil
 import socket
-from typing import Dict, List, Tuple
-from .constants import COMMON_SERVICES
+import asyncio
+import errno
+import os
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from .constants import COMMON_SERVICES, DEFAULT_HOST
 
-def scan_local_ports() -> List[Tuple[int, str]]:
+ProgressCallback = Callable[[int, int], None] # (done, total)
+
+# Generic wrappers whose process name says little about the service behind them
+GENERIC_PROCESSES = ["docker-proxy", "python", "python3", "node"]
+
+@dataclass
+class ListenSocket:
+    """A listening port with every bind address and address family it was seen on."""
+    port: int
+    name: str
+    pids: List[int] = field(default_factory=list)
+    addresses: List[str] = field(default_factory=list)
+    families: List[str] = field(default_factory=list) # "IPv4" / "IPv6"
+
+class DiscoveryEngine:
     """
-    Scans locally bound ports and maps them to real process names.
-    Returns a list of (port, name).
+    Resolves listening sockets to process names with one lookup per PID.
+
+    Process names are cached across scans keyed by (pid, create_time), so a
+    re-scan on a busy host costs roughly one net_connections() call plus a
+    create_time read per listening process. Entries for exited processes are
+    dropped on the next scan.
     """
-    found_ports = []
-    
-    try:
-        # Get all connections with PID info
-        connections = psutil.net_connections(kind='inet')
+    def __init__(self):
+        self._process_cache: Dict[Tuple[int, float], str] = {}
+
+    def _process_name(self, pid: int) -> Optional[str]:
+        try:
+            proc = psutil.Process(pid)
+            key = (pid, proc.create_time())
+            if key not in self._process_cache:
+                self._process_cache[key] = proc.name()
+            return self._process_cache[key]
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return None
+
+    def scan(self, sweep: Optional[Sequence[int]] = None,
+             progress: Optional[ProgressCallback] = None) -> List[ListenSocket]:
+        """
+        Scans locally bound ports. Dual-stack sockets are merged into one entry per port.
+        If the socket table is not readable, `sweep` (default: the well-known ports)
+        is connect-swept instead.
+        """
+        try:
+            connections = psutil.net_connections(kind='inet')
+        except (psutil.AccessDenied, psutil.NoSuchProcess):
+            return self._fallback_scan(sweep, progress)
+
+        # Group sockets by PID so each process is resolved once
+        by_pid: Dict[Optional[int], List] = defaultdict(list)
         for conn in connections:
             if conn.status == 'LISTEN':
+                by_pid[conn.pid].append(conn)
+
+        found: Dict[int, ListenSocket] = {}
+        live_pids = set()
+        for pid, conns in by_pid.items():
+            proc_name = None
+            if pid:
+                live_pids.add(pid)
+                proc_name = self._process_name(pid)
+            for conn in conns:
                 port = conn.laddr.port
-                name = "Unknown"
-                
-                if conn.pid:
-                    try:
-                        proc = psutil.Process(conn.pid)
-                        name = proc.name()
-                        # If it's a generic wrapper, try to show the command line or fallback
-                        if name in ["docker-proxy", "python", "python3", "node"]:
-                            # Try to see if we have a mapped name for better context
-                            friendly = COMMON_SERVICES.get(port)
-                            name = f"{name} ({friendly})" if friendly else name
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        name = COMMON_SERVICES.get(port, "System Process")
-                
-                found_ports.append((port, name))
-    except (psutil.AccessDenied, psutil.NoSuchProcess):
-        # Fallback for restricted environments
-        for port in COMMON_SERVICES.keys():
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(0.01)
-                if s.connect_ex(('127.0.0.1', port)) == 0:
-                    found_ports.append((port, COMMON_SERVICES[port]))
-                    
-    # Remove duplicates and sort
-    unique_found = {p: n for p, n in found_ports}
-    return sorted(unique_found.items())
-
-def check_service_health(port: int) -> bool:
-    """Checks if a port is still listening."""
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.settimeout(1.0)
-        return s.connect_ex(('127.0.0.1', port)) == 0
+                if not pid:
+                    name = "Unknown"
+                elif proc_name is None:
+                    name = COMMON_SERVICES.get(port, "System Process")
+                elif proc_name in GENERIC_PROCESSES and port in COMMON_SERVICES:
+                    # Show the mapped service name for better context
+                    name = f"{proc_name} ({COMMON_SERVICES[port]})"
+                else:
+                    name = proc_name
+
+                entry = found.setdefault(port, ListenSocket(port=port, name=name))
+                if name not in entry.name.split(" / "):
+                    entry.name = f"{entry.name} / {name}"
+                if pid and pid not in entry.pids:
+                    entry.pids.append(pid)
+                if conn.laddr.ip not in entry.addresses:
+                    entry.addresses.append(conn.laddr.ip)
+                family = "IPv6" if conn.family == socket.AF_INET6 else "IPv4"
+                if family not in entry.families:
+                    entry.families.append(family)
+
+        self._process_cache = {k: v for k, v in self._process_cache.items() if k[0] in live_pids}
+        return sorted(found.values(), key=lambda s: s.port)
+
+    def _fallback_scan(self, ports: Optional[Sequence[int]] = None,
+                       progress: Optional[ProgressCallback] = None) -> List[ListenSocket]:
+        """Fallback for restricted environments: connect-sweep the ports directly."""
+        ports = list(COMMON_SERVICES.keys()) if ports is None else ports
+        open_ports = asyncio.run(sweep_ports(DEFAULT_HOST, ports, progress=progress))
+        return [
+            ListenSocket(port=port, name=COMMON_SERVICES.get(port, "Unknown"),
+                         addresses=[DEFAULT_HOST], families=["IPv4"])
+            for port in open_ports
+        ]
+
+class AdaptiveTimeout:
+    """
+    RFC 6298-style retransmission timer: the connect timeout follows the
+    smoothed RTT of answered connects (accepted or refused), clamped to
+    [minimum, maximum]. Localhost sweeps converge to the minimum quickly.
+    """
+    def __init__(self, minimum: float = 0.05, maximum: float = 1.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+
+    def observe(self, rtt: float):
+        if self.srtt is None:
+            self.srtt, self.rttvar = rtt, rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+    @property
+    def value(self) -> float:
+        if self.srtt is None:
+            return self.maximum
+        return min(self.maximum, max(self.minimum, self.srtt + 4 * self.rttvar))
+
+async def _sweep_connect(family: int, address: str, port: int, timeout: float) -> Optional[int]:
+    """
+    Bare non-blocking connect for sweeps: no stream objects, and refusals that the
+    kernel reports synchronously (the common case on localhost) never touch the loop.
+    Returns 0 if open, an errno if refused, or None on timeout.
+    """
+    if os.name == 'nt':
+        from .probes import probe_tcp # probes imports this module
+        result = await probe_tcp(address, port, timeout)
+        return 0 if result.up else (None if result.error == errno.ETIMEDOUT else result.error)
+    loop = asyncio.get_running_loop()
+    with socket.socket(family, socket.SOCK_STREAM) as s:
+        s.setblocking(False)
+        rc = s.connect_ex((address, port))
+        if rc not in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY):
+            return rc
+        try:
+            await asyncio.wait_for(loop.sock_connect(s, (address, port)), timeout)
+        except asyncio.TimeoutError:
+            return None
+        except OSError as e:
+            return e.errno
+        return 0
+
+async def sweep_ports(
+    host: str = DEFAULT_HOST,
+    ports: Iterable[int] = range(1, 65536),
+    concurrency: int = 500,
+    min_timeout: float = 0.05,
+    max_timeout: float = 1.0,
+    progress: Optional[ProgressCallback] = None,
+) -> List[int]:
+    """
+    Connect-sweeps `ports` on `host` with bounded concurrency and adaptive
+    timeouts. Returns the sorted list of open ports.
+    """
+    ports = list(ports)
+    total = len(ports)
+    # Resolve once up front rather than once per connect
+    family, _, _, _, sockaddr = (await asyncio.get_running_loop().getaddrinfo(
+        host, None, type=socket.SOCK_STREAM))[0]
+    address = sockaddr[0]
+    timeout = AdaptiveTimeout(min_timeout, max_timeout)
+    pending = iter(ports)
+    open_ports: List[int] = []
+    done = 0
+
+    # A fixed pool of workers instead of one task per port keeps memory flat on full-range sweeps
+    async def _worker():
+        nonlocal done
+        for port in pending:
+            started = time.perf_counter()
+            rc = await _sweep_connect(family, address, port, timeout.value)
+            if rc is not None:
+                timeout.observe(time.perf_counter() - started)
+            if rc == 0:
+                open_ports.append(port)
+            done += 1
+            if progress is not None:
+                progress(done, total)
+            if done % 256 == 0:
+                await asyncio.sleep(0) # synchronous refusals never yield on their own
+
+    await asyncio.gather(*(_worker() for _ in range(max(1, min(concurrency, total)))))
+    return sorted(open_ports)
+
+def parse_port_ranges(spec: str) -> List[int]:
+    """Parses '22,80,8000-9000' into a sorted list of ports within 1-65535."""
+    ports = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        low, _, high = part.partition("-")
+        start, end = int(low), int(high or low)
+        ports.update(range(max(1, start), min(65535, end) + 1))
+    return sorted(ports)
+
+# TCP state code for LISTEN in /proc/net/tcp{,6}
+_PROC_LISTEN = "0A"
+
+def _decode_proc_address(hex_addr: str) -> str:
+    """/proc/net/tcp stores addresses as 32-bit words in host (little-endian) order."""
+    raw = bytes.fromhex(hex_addr)
+    swapped = b"".join(raw[i:i + 4][::-1] for i in range(0, len(raw), 4))
+    family = socket.AF_INET if len(raw) == 4 else socket.AF_INET6
+    return socket.inet_ntop(family, swapped)
+
+def read_listen_table() -> Dict[int, Set[str]]:
+    """
+    Returns port -> bind addresses of every listening TCP socket, from a single
+    read of /proc/net/tcp{,6} on Linux or one net_connections() call elsewhere.
+    """
+    table: Dict[int, Set[str]] = defaultdict(set)
+    proc_files = ["/proc/net/tcp", "/proc/net/tcp6"]
+    if os.path.exists(proc_files[0]):
+        for path in proc_files:
+            try:
+                with open(path, "r") as f:
+                    next(f, None) # header
+                    for line in f:
+                        fields = line.split()
+                        if len(fields) < 4 or fields[3] != _PROC_LISTEN:
+                            continue
+                        hex_addr, hex_port = fields[1].split(":")
+                        table[int(hex_port, 16)].add(_decode_proc_address(hex_addr))
+            except OSError:
+                continue
+        return table
+
+    for conn in psutil.net_connections(kind='tcp'):
+        if conn.status == 'LISTEN':
+            table[conn.laddr.port].add(conn.laddr.ip)
+    return table
+
+@dataclass
+class DiscoveryDiff:
+    """What changed between two scans, keyed on port, PID and process name."""
+    added: List[ListenSocket] = field(default_factory=list)
+    removed: List[ListenSocket] = field(default_factory=list)
+    rebound: List[Tuple[ListenSocket, ListenSocket]] = field(default_factory=list) # (before, after)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.rebound)
+
+    def describe(self, watched: Iterable[int] = (), enrolled: Iterable[int] = ()) -> str:
+        """One notification for the whole diff."""
+        watched, enrolled = set(watched), set(enrolled)
+        def pids(s: ListenSocket) -> str:
+            return f" (pid {', '.join(map(str, s.pids))})" if s.pids else ""
+        counts = [f"{len(items)} {label}" for items, label in
+                  ((self.added, "new"), (self.removed, "gone"), (self.rebound, "rebound")) if items]
+        lines = [f"🔎 Discovery: {', '.join(counts)}"]
+        for s in self.added:
+            note = " [enrolled]" if s.port in enrolled else " [watched]" if s.port in watched else ""
+            lines.append(f"➕ {s.name} ({s.port}){note}")
+        for s in self.removed:
+            lines.append(f"➖ {s.name} ({s.port}){' [watched]' if s.port in watched else ''}")
+        for before, after in self.rebound:
+            lines.append(f"🔁 {after.port}: {before.name}{pids(before)} → {after.name}{pids(after)}")
+        return "\n".join(lines)
+
+def diff_listeners(before: Dict[int, ListenSocket], after: Dict[int, ListenSocket]) -> DiscoveryDiff:
+    """Compares two port -> ListenSocket snapshots."""
+    diff = DiscoveryDiff()
+    for port, now in after.items():
+        old = before.get(port)
+        if old is None:
+            diff.added.append(now)
+        elif (sorted(old.pids), old.name) != (sorted(now.pids), now.name):
+            diff.rebound.append((old, now))
+    diff.removed = [old for port, old in before.items() if port not in after]
+    return diff
+
+_engine = DiscoveryEngine()
+
+def discover_listeners(sweep: Optional[Sequence[int]] = None,
+                       progress: Optional[ProgressCallback] = None) -> List[ListenSocket]:
+    """Scans with the process-wide engine, reusing its process cache."""
+    return _engine.scan(sweep, progress)
+
+def scan_local_ports() -> List[Tuple[int, str]]:
+    """
+    Scans locally bound ports and maps them to real process names.
+    Returns a list of (port, name).
+    """
+    return [(s.port, s.name) for s in discover_listeners()]
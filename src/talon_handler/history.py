@@ -0,0 +1,155 @@
+import bisect
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+from .constants import HISTORY_FILE
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+_HIST_COLUMNS = [f"h{i}" for i in range(len(LATENCY_BUCKETS_MS) + 1)]
+
+MINUTE = 60
+HOUR = 3600
+
+@dataclass
+class Summary:
+    """Aggregated view of one target over a window."""
+    samples: int
+    uptime: float # percent
+    p50_ms: Optional[float] = None
+    p99_ms: Optional[float] = None
+
+def _percentile(hist: List[int], q: float) -> Optional[float]:
+    total = sum(hist)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for i, count in enumerate(hist):
+        seen += count
+        if seen >= rank:
+            # Report the bucket's upper bound; the overflow bucket reports its lower bound
+            return float(LATENCY_BUCKETS_MS[min(i, len(LATENCY_BUCKETS_MS) - 1)])
+    return float(LATENCY_BUCKETS_MS[-1])
+
+class HistoryStore:
+    """
+    SQLite-backed time series of probe outcomes and connect latency.
+
+    Samples are buffered in memory and inserted in one transaction per flush.
+    Every sample is also folded into 1-minute and 1-hour rollups (counts plus a
+    fixed latency histogram) as it is written, so uptime and p50/p99 queries read
+    a bounded number of rollup rows instead of raw history. Raw samples, minute
+    and hour rollups each have their own retention.
+    """
+    def __init__(
+        self,
+        path: str = HISTORY_FILE,
+        raw_retention: float = 2 * HOUR,
+        minute_retention: float = 2 * 24 * HOUR,
+        hour_retention: float = 90 * 24 * HOUR,
+    ):
+        self.path = path
+        self.raw_retention = raw_retention
+        self.minute_retention = minute_retention
+        self.hour_retention = hour_retention
+        self._buffer: List[Tuple[str, float, bool, Optional[float]]] = []
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(f"""
+            CREATE TABLE IF NOT EXISTS samples (
+                target TEXT NOT NULL,
+                ts REAL NOT NULL,
+                up INTEGER NOT NULL,
+                latency_ms REAL
+            );
+            CREATE INDEX IF NOT EXISTS samples_target_ts ON samples (target, ts);
+            CREATE TABLE IF NOT EXISTS rollups (
+                target TEXT NOT NULL,
+                resolution INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                up_count INTEGER NOT NULL,
+                {", ".join(f"{c} INTEGER NOT NULL DEFAULT 0" for c in _HIST_COLUMNS)},
+                PRIMARY KEY (target, resolution, bucket)
+            );
+        """)
+
+    def record(self, target: str, up: bool, latency_ms: Optional[float] = None, ts: Optional[float] = None):
+        """Buffers one sample; nothing touches the disk until flush()."""
+        self._buffer.append((target, time.time() if ts is None else ts, up, latency_ms))
+
+    def flush(self):
+        """Writes buffered samples and their rollups in a single transaction."""
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+            if batch:
+                rollup_rows = []
+                for target, ts, up, latency_ms in batch:
+                    hist = [0] * len(_HIST_COLUMNS)
+                    if up and latency_ms is not None:
+                        hist[bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)] = 1
+                    for resolution in (MINUTE, HOUR):
+                        bucket = int(ts // resolution) * resolution
+                        rollup_rows.append((target, resolution, bucket, 1, int(up), *hist))
+
+                columns = ", ".join(_HIST_COLUMNS)
+                placeholders = ", ".join("?" * (5 + len(_HIST_COLUMNS)))
+                increments = ", ".join(f"{c} = {c} + excluded.{c}" for c in ["count", "up_count"] + _HIST_COLUMNS)
+                with self._db:
+                    self._db.executemany(
+                        "INSERT INTO samples (target, ts, up, latency_ms) VALUES (?, ?, ?, ?)",
+                        [(t, ts, int(up), lat) for t, ts, up, lat in batch],
+                    )
+                    self._db.executemany(
+                        f"INSERT INTO rollups (target, resolution, bucket, count, up_count, {columns}) "
+                        f"VALUES ({placeholders}) "
+                        f"ON CONFLICT (target, resolution, bucket) DO UPDATE SET {increments}",
+                        rollup_rows,
+                    )
+
+            now = time.time()
+            if now - self._last_prune >= MINUTE * 10:
+                self._prune(now)
+                self._last_prune = now
+
+    def _prune(self, now: float):
+        with self._db:
+            self._db.execute("DELETE FROM samples WHERE ts < ?", (now - self.raw_retention,))
+            self._db.execute("DELETE FROM rollups WHERE resolution = ? AND bucket < ?", (MINUTE, now - self.minute_retention))
+            self._db.execute("DELETE FROM rollups WHERE resolution = ? AND bucket < ?", (HOUR, now - self.hour_retention))
+
+    def summaries(self, targets: Iterable[str], window: float = 24 * HOUR) -> Dict[str, Summary]:
+        """Uptime and latency percentiles per target over the last `window` seconds."""
+        # Minute rollups while they are retained, hourly ones beyond that
+        resolution = MINUTE if window <= self.minute_retention else HOUR
+        since = time.time() - window
+        keys = list(targets)
+        result: Dict[str, Summary] = {}
+        if not keys:
+            return result
+        sums = ", ".join(f"SUM({c})" for c in ["count", "up_count"] + _HIST_COLUMNS)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT target, {sums} FROM rollups "
+                f"WHERE resolution = ? AND bucket >= ? AND target IN ({', '.join('?' * len(keys))}) "
+                f"GROUP BY target",
+                (resolution, int(since // resolution) * resolution, *keys),
+            ).fetchall()
+        for target, count, up_count, *hist in rows:
+            result[target] = Summary(
+                samples=count,
+                uptime=100.0 * up_count / count if count else 0.0,
+                p50_ms=_percentile(hist, 0.50),
+                p99_ms=_percentile(hist, 0.99),
+            )
+        return result
+
+    def close(self):
+        self.flush()
+        self._db.close()
@@ -0,0 +1,148 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+from .constants import LOG_FILE
+
+logger = logging.getLogger("talon")
+# Silent until setup_logging() runs, e.g. for one-shot CLI commands and tests
+logger.addHandler(logging.NullHandler())
+logger.propagate = False
+logger.setLevel(logging.INFO)
+
+class TextFormatter(logging.Formatter):
+    """Keeps the historical `<timestamp>: <message>` line format of talon.log."""
+    def format(self, record: logging.LogRecord) -> str:
+        return f"{datetime.fromtimestamp(record.created)}: {record.getMessage()}"
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; structured `fields` passed via extra= are merged in."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        return json.dumps(entry, default=str)
+
+class BatchWriter(threading.Thread):
+    """
+    Background thread that drains the log queue in batches, writes each batch
+    with a single write() + flush(), and rotates by size and by age, keeping
+    `backup_count` old files (talon.log.1 is the newest).
+    """
+    _STOP = object()
+
+    def __init__(self, records: "queue.Queue", path: str, formatter: logging.Formatter,
+                 max_bytes: int = 5_000_000, backup_count: int = 5,
+                 rotate_interval: float = 86400, batch_size: int = 512):
+        super().__init__(name="talon-log-writer", daemon=True)
+        self.records = records
+        self.path = path
+        self.formatter = formatter
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.rotate_interval = rotate_interval
+        self.batch_size = batch_size
+        self.handler: Optional[logging.Handler] = None # set by setup_logging
+        self._file = None
+        self._opened_at = 0.0
+
+    def _open(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._opened_at = time.time()
+
+    def _expired(self) -> bool:
+        return bool(self.rotate_interval) and time.time() - self._opened_at >= self.rotate_interval
+
+    def _rotate(self):
+        self._file.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                src = f"{self.path}.{i}"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def _flush(self, lines: List[str]):
+        if lines:
+            self._file.write("".join(lines))
+            self._file.flush()
+
+    def _write(self, batch: List[logging.LogRecord]):
+        lines = []
+        size = self._file.tell()
+        for record in batch:
+            try:
+                line = self.formatter.format(record) + "\n"
+            except Exception:
+                continue
+            lines.append(line)
+            size += len(line.encode("utf-8"))
+            # Rotate mid-batch so one large batch can't overshoot max_bytes
+            if self.max_bytes and size >= self.max_bytes:
+                self._flush(lines)
+                self._rotate()
+                lines, size = [], 0
+        self._flush(lines)
+        if self._expired():
+            self._rotate()
+
+    def run(self):
+        self._open()
+        try:
+            while True:
+                batch = [self.records.get()]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.records.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = any(item is self._STOP for item in batch)
+                try:
+                    self._write([r for r in batch if r is not self._STOP])
+                except OSError:
+                    pass # Never let a full disk kill logging for the process
+                if stop:
+                    return
+        finally:
+            self._file.close()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """Detaches from the logger, flushes everything queued so far and stops the thread."""
+        if self.handler is not None:
+            logger.removeHandler(self.handler)
+        self.records.put(self._STOP)
+        self.join(timeout)
+
+class _RecordQueueHandler(logging.handlers.QueueHandler):
+    # Keep the record untouched; the writer thread does all formatting
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+def setup_logging(path: str = LOG_FILE, json_lines: bool = False, max_bytes: int = 5_000_000,
+                  backup_count: int = 5, rotate_interval: float = 86400) -> BatchWriter:
+    """
+    Routes the `talon` logger through a queue to a background BatchWriter, so a
+    log call on the event loop costs one queue put. Returns the writer; call
+    its stop() on shutdown to flush.
+    """
+    records: "queue.Queue" = queue.Queue()
+    writer = BatchWriter(records, path, JsonFormatter() if json_lines else TextFormatter(),
+                         max_bytes=max_bytes, backup_count=backup_count, rotate_interval=rotate_interval)
+    for handler in list(logger.handlers):
+        if isinstance(handler, _RecordQueueHandler):
+            logger.removeHandler(handler)
+    writer.handler = _RecordQueueHandler(records)
+    logger.addHandler(writer.handler)
+    writer.start()
+    return writer
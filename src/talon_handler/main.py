@@ -1,28 +1,24 @@
 import typer
-import asyncio
 import os
 import signal
-import subprocess
 import sys
-import shutil
-from datetime import datetime
-from rich.console import Console
-from rich.table import Table
-from typing import Optional
+from typing import List, Optional
 from .config import ConfigManager
-from .discovery import scan_local_ports
-from .monitor import TalonMonitor
-from .telegram_bot import TalonBot
-from .constants import PID_FILE
+from .constants import PID_FILE, DEFAULT_HOST
+from .targets import Target
+from .utils import LazyConsole
 from . import __version__
 
+# Heavy dependencies (telegram, httpx, psutil, asyncio, rich) are imported inside
+# the commands that use them, so `talon --version`, `talon code` and friends start fast.
+
 def version_callback(value: bool):
     if value:
         typer.echo(f"Talon Handler version: {__version__}")
         raise typer.Exit()
 
 app = typer.Typer(help="🦅 Talon Handler: Homelab Service Discovery & Monitoring")
-console = Console()
+console = LazyConsole()
 
 @app.callback()
 def main(
@@ -49,8 +45,14 @@ def is_running():
     return None
 
 @app.command()
-def headstart():
+def headstart(
+    ports: Optional[str] = typer.Option(
+        None, "--ports", help="Port ranges to sweep when the socket table is unreadable, e.g. 1-65535"
+    ),
+):
     """Initial setup and first-time scan."""
+    from rich.table import Table
+    from .discovery import discover_listeners, parse_port_ranges
     config = ConfigManager()
     if config.data and "telegram_token" in config.data:
         overwrite = typer.confirm("Configuration already exists. Reset everything?")
@@ -60,23 +62,27 @@ def headstart():
     console.print("[bold green]🚀 Talon Headstart Initializing...[/bold green]")
     
     # 1. Smart Scan
-    with console.status("[cyan]Performing Smart Scan of local ports...[/cyan]"):
-        found = scan_local_ports()
+    with console.status("[cyan]Performing Smart Scan of local ports...[/cyan]") as status:
+        def progress(done: int, total: int):
+            if done == total or done % 512 == 0:
+                status.update(f"[cyan]Sweeping local ports... {done}/{total}[/cyan]")
+
+        sweep = parse_port_ranges(ports) if ports else None
+        found = discover_listeners(sweep, progress)
     
     table = Table(title="Discovered Services")
     table.add_column("Port", style="cyan")
     table.add_column("Detected Process / Service", style="magenta")
+    table.add_column("Bind Address", style="dim")
     
-    watchlist = {}
-    service_names = {}
-    for port, name in found:
-        table.add_row(str(port), name)
-        watchlist[str(port)] = True 
-        service_names[str(port)] = name
+    targets = []
+    for listener in found:
+        families = "/".join(listener.families)
+        table.add_row(str(listener.port), listener.name, f"{', '.join(listener.addresses)} ({families})")
+        targets.append(Target(port=listener.port, name=listener.name))
     
     console.print(table)
-    config.data["watchlist"] = watchlist
-    config.data["service_names"] = service_names
+    config.update({"targets": [t.to_dict() for t in targets]})
     
     # 2. Config Audit
     config.interactive_audit()
@@ -123,29 +129,81 @@ def telegram(new: bool = typer.Option(False, "--new", help="Generate a fresh OTP
 def filter():
     """Interactive toggle for monitored services."""
     cfg = ConfigManager()
-    watchlist = cfg.get_watchlist()
+    targets = cfg.get_targets()
     
-    if not watchlist:
+    if not targets:
         console.print("[red]No services in watchlist. Run 'talon headstart' first.[/red]")
         return
 
     console.print("[bold cyan]Monitoring Filter (Toggle Status)[/bold cyan]")
     
-    updated_watchlist = {}
-    for port_str, status in watchlist.items():
-        state = "ENABLED" if status else "DISABLED"
-        toggle = typer.confirm(f"Port {port_str} ({state}) - Keep enabled?")
-        updated_watchlist[port_str] = toggle
-        
-    cfg.update_watchlist(updated_watchlist)
+    states = {}
+    for target in targets:
+        state = "ENABLED" if target.enabled else "DISABLED"
+        states[target.key] = typer.confirm(f"{target.name} on {target.host}:{target.port} ({state}) - Keep enabled?")
+
+    # Only the toggles are written: targets added meanwhile (talon add, auto-enroll) are kept
+    cfg.set_enabled(states)
     console.print("[green]Watchlist filters updated.[/green]")
 
+@app.command()
+def add(
+    port: Optional[int] = typer.Argument(None, help="Port to watch (not needed for process targets)"),
+    host: str = typer.Option(DEFAULT_HOST, "--host", "-H", help="Host or IP of the target"),
+    name: str = typer.Option("Unknown", "--name", "-n", help="Display name for alerts and the dashboard"),
+    protocol: str = typer.Option("tcp", "--protocol", "-p", help="Probe type: tcp, http, https, tls, dns, dns-tcp, host or process"),
+    path: Optional[str] = typer.Option(None, "--path", help="HTTP(S) request path"),
+    expect_status: Optional[int] = typer.Option(None, "--expect-status", help="Required HTTP status (default: any below 400)"),
+    expect_body: Optional[str] = typer.Option(None, "--expect-body", help="Text the HTTP response body must contain"),
+    query: Optional[str] = typer.Option(None, "--query", help="Name to resolve for DNS probes, or the process name for process probes"),
+    cert_min_days: Optional[int] = typer.Option(None, "--cert-min-days", help="Fail when the TLS certificate expires sooner"),
+    insecure: bool = typer.Option(False, "--insecure", help="Skip TLS verification (self-signed certificates)"),
+    mode: Optional[str] = typer.Option(None, "--mode", help="tcp only: 'active' (connect) or 'passive' (read the local LISTEN table)"),
+    parent: Optional[List[str]] = typer.Option(None, "--parent", help="Name or key of a target this one depends on (repeatable)"),
+):
+    """Adds a (possibly remote) target to the watchlist."""
+    from .probes import PROBES
+    if mode not in (None, "active", "passive"):
+        console.print("[red]--mode must be 'active' or 'passive'.[/red]")
+        raise typer.Exit(1)
+    if protocol not in PROBES:
+        console.print(f"[red]Unknown protocol '{protocol}'. Choose from: {', '.join(PROBES)}[/red]")
+        raise typer.Exit(1)
+    if protocol == "process":
+        if not query:
+            console.print("[red]Process probes need --query with the process name.[/red]")
+            raise typer.Exit(1)
+        port = port or 0
+    elif port is None or not 1 <= port <= 65535:
+        console.print("[red]Give a port between 1 and 65535.[/red]")
+        raise typer.Exit(1)
+    cfg = ConfigManager()
+    target = Target(
+        port=port, host=host, protocol=protocol, name=name, path=path,
+        expect_status=expect_status, expect_body=expect_body, query=query,
+        cert_min_days=cert_min_days, verify_tls=not insecure, mode=mode, parents=parent or None,
+    )
+    targets = [t for t in cfg.get_targets() if t.key != target.key]
+    targets.append(target)
+    cfg.update_targets(targets)
+    console.print(f"[green]Now watching {target.name} at {target.key}.[/green]")
+
 @app.command()
 def monitor(
     detach: bool = typer.Option(False, "--detach", "-d", help="Run in the background"),
-    force: bool = typer.Option(False, "--force", "-f", help="Force start even if PID file exists")
+    force: bool = typer.Option(False, "--force", "-f", help="Force start even if PID file exists"),
+    metrics_port: Optional[int] = typer.Option(None, "--metrics-port", help="Serve Prometheus metrics on this port (overrides 'metrics_port' in config)"),
+    workers: Optional[int] = typer.Option(None, "--workers", "-w", help="Probe in this many worker processes (overrides 'probe_workers' in config; 0 = in-process)")
 ):
     """Starts the background monitoring loop and Telegram bot."""
+    import asyncio
+    import shutil
+    import subprocess
+    from .control_server import ControlServer
+    from .log import logger, setup_logging
+    from .metrics import MetricsServer
+    from .monitor import TalonMonitor
+    from .telegram_bot import TalonBot
     if not force and is_running():
         console.print("[yellow]Talon is already running.[/yellow]")
         return
@@ -154,6 +212,10 @@ def monitor(
         # Get absolute path of 'talon' to ensure it's found in the detached session
         talon_path = shutil.which("talon") or "talon"
         cmd = [talon_path, "monitor"]
+        if metrics_port is not None:
+            cmd += ["--metrics-port", str(metrics_port)]
+        if workers is not None:
+            cmd += ["--workers", str(workers)]
         # Use subprocess to detach
         if os.name == 'nt':
             # Windows background
@@ -170,39 +232,183 @@ def monitor(
     with open(PID_FILE, "w") as f:
         f.write(str(os.getpid()))
     
-    with open("talon.log", "a") as log:
-        log.write(f"{datetime.now()}: [PID {os.getpid()}] Talon Eye started.\n")
+    cfg = ConfigManager.shared()
+    log_writer = setup_logging(
+        json_lines=cfg.data.get("log_format", "text") == "json",
+        max_bytes=int(cfg.data.get("log_max_bytes", 5_000_000)),
+        backup_count=int(cfg.data.get("log_backup_count", 5)),
+        rotate_interval=float(cfg.data.get("log_rotate_interval", 86400)),
+    )
+    logger.info(f"[PID {os.getpid()}] Talon Eye started.")
 
-    cfg = ConfigManager()
     token = cfg.data.get("telegram_token")
+    if metrics_port is None and cfg.data.get("metrics_port"):
+        metrics_port = int(cfg.data["metrics_port"])
     
     if not token:
         console.print("[red]Telegram Token not found. Run 'talon headstart' first.[/red]")
         if os.path.exists(PID_FILE): os.remove(PID_FILE)
+        log_writer.stop()
         return
 
     console.print("[bold green]🦅 Talon Eye is watching...[/bold green]")
     
     async def start_services():
+        loop = asyncio.get_running_loop()
+        stop_requested = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, stop_requested.set)
+            except (NotImplementedError, AttributeError, ValueError):
+                pass # Windows: Ctrl+C still raises KeyboardInterrupt
+
         bot = TalonBot(token)
-        monitor = TalonMonitor()
-        await asyncio.gather(bot.run(), monitor.run_loop())
+        monitor = TalonMonitor(bot=bot, workers=workers)
+        control = ControlServer(monitor, stop_requested.set)
+        await control.start()
+        metrics = None
+        if metrics_port:
+            # Scrapes are served on this loop from the monitor's in-memory snapshot
+            metrics = MetricsServer(monitor.metrics, cfg.data.get("metrics_host", "127.0.0.1"), metrics_port)
+            await metrics.start()
+        await bot.run()
+        loop_task = asyncio.create_task(monitor.run_loop())
+        stop_wait = asyncio.create_task(stop_requested.wait())
+        try:
+            await asyncio.wait([loop_task, stop_wait], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # Graceful stop: pending alerts go out through the bot before it shuts down
+            logger.info("Shutting down...")
+            for task in (loop_task, stop_wait):
+                task.cancel()
+            await monitor.close()
+            await bot.stop()
+            if metrics is not None:
+                await metrics.stop()
+            control.stopped.set()
+            await control.stop()
+            logger.info(f"[PID {os.getpid()}] Talon Eye stopped.")
 
     try:
         asyncio.run(start_services())
     except KeyboardInterrupt:
         console.print("\n[yellow]Talon Eye closed.[/yellow]")
     except Exception as fatal_e:
-        with open("talon.log", "a") as log:
-            log.write(f"{os.getpid()} - FATAL ERROR: {fatal_e}\n")
+        logger.critical(f"{os.getpid()} - FATAL ERROR: {fatal_e}")
         console.print(f"[red]Fatal Error: {fatal_e}[/red]")
     finally:
         if os.path.exists(PID_FILE):
             os.remove(PID_FILE)
+        log_writer.stop()
+
+@app.command()
+def stats():
+    """Shows the monitor's rolling phase timings, loop lag and scan drift."""
+    from rich.table import Table
+    from .control import ControlError, request
+    from .stats import read_stats
+    try:
+        snapshot = request("stats")
+    except ControlError:
+        snapshot = read_stats() # last snapshot the daemon wrote
+    if not snapshot:
+        console.print("[yellow]No stats yet. Is 'talon monitor' running?[/yellow]")
+        return
+    import time
+    age = time.time() - snapshot.get("updated", 0)
+    table = Table(title=f"Talon Stats (PID {snapshot.get('pid')}, updated {age:.0f}s ago)")
+    table.add_column("Phase", style="cyan")
+    table.add_column("Samples", justify="right")
+    table.add_column("p50 (ms)", justify="right")
+    table.add_column("p95 (ms)", justify="right")
+    table.add_column("max (ms)", justify="right", style="magenta")
+    for name, s in snapshot.get("phases", {}).items():
+        table.add_row(name, str(s["count"]), f"{s['p50_ms']:.1f}", f"{s['p95_ms']:.1f}", f"{s['max_ms']:.1f}")
+    console.print(table)
+
+@app.command()
+def status():
+    """Shows live per-target state from the running monitor."""
+    from rich.table import Table
+    from .control import ControlError, request
+    try:
+        snapshot = request("status")
+    except ControlError as e:
+        console.print(f"[yellow]{e}[/yellow]")
+        raise typer.Exit(1)
+    table = Table(title=f"Talon Status (PID {snapshot['pid']})")
+    table.add_column("Service", style="cyan")
+    table.add_column("Target", style="dim")
+    table.add_column("Status")
+    table.add_column("Latency", justify="right")
+    table.add_column("Strikes", justify="right")
+    names = {row["key"]: row["name"] for row in snapshot["targets"]}
+    for row in snapshot["targets"]:
+        suppressed = row.get("suppressed")
+        if row["paused"]:
+            state = "[dim]⏸ PAUSED[/dim]"
+        elif suppressed:
+            parent = names.get(row.get("blocked_by"), "parent")
+            state = f"[dim]⏭ not probed ({parent} down)[/dim]"
+        elif row["up"] is None:
+            state = "[dim]… PENDING[/dim]"
+        elif row["up"]:
+            state = "[yellow]🐢 SLOW[/yellow]" if row["slow"] else "[green]✅ UP[/green]"
+        else:
+            detail = f" ({row['detail']})" if row["detail"] else ""
+            state = f"[red]❌ DOWN{detail}[/red]"
+        latency = "-" if row["latency_ms"] is None or suppressed else f"{row['latency_ms']:.0f} ms"
+        table.add_row(row["name"], row["key"], state, latency, str(row["strikes"]))
+    console.print(table)
+
+def _rpc(cmd: str, **args):
+    from .control import ControlError, request
+    try:
+        return request(cmd, **args)
+    except ControlError as e:
+        console.print(f"[red]{e}[/red]")
+        raise typer.Exit(1)
+
+@app.command()
+def reload():
+    """Makes the running monitor re-read its configuration now."""
+    result = _rpc("reload")
+    state = "Configuration reloaded" if result["changed"] else "Configuration unchanged"
+    console.print(f"[green]{state} ({result['targets']} targets).[/green]")
+
+@app.command()
+def rescan(target: Optional[str] = typer.Argument(None, help="Key, name or port (default: every target)")):
+    """Probes targets immediately instead of waiting for their next slot."""
+    result = _rpc("rescan", target=target) if target else _rpc("rescan")
+    console.print(f"[green]Queued {result['queued']} target(s) for an immediate probe.[/green]")
+
+@app.command()
+def pause(target: str = typer.Argument(..., help="Key, name or port")):
+    """Pauses probing and alerts for a target until resumed or restarted."""
+    result = _rpc("pause", target=target)
+    console.print(f"[yellow]Paused: {', '.join(result['paused'])}[/yellow]")
+
+@app.command()
+def resume(target: str = typer.Argument(..., help="Key, name or port")):
+    """Resumes a paused target."""
+    result = _rpc("resume", target=target)
+    console.print(f"[green]Resumed: {', '.join(result['resumed'])}[/green]")
 
 @app.command()
 def stop():
-    """Stops the background Talon monitor."""
+    """Stops the background Talon monitor, sending any queued alerts first."""
+    from .control import ControlError, ControlUnavailable, request
+    try:
+        request("shutdown", timeout=30) # returns once queued alerts are sent and the bot has stopped
+        console.print("[green]Talon stopped successfully.[/green]")
+        return
+    except ControlUnavailable:
+        pass
+    except ControlError as e:
+        console.print(f"[red]Failed to stop Talon: {e}[/red]")
+        return
+
+    # No control socket (older daemon): fall back to SIGTERM, which also stops gracefully now
     pid = is_running()
     if pid:
         console.print(f"[cyan]Stopping Talon (PID: {pid})...[/cyan]")
@@ -0,0 +1,176 @@
+import asyncio
+import bisect
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+from .history import LATENCY_BUCKETS_MS
+from .log import logger
+from .probes import ProbeResult
+from .targets import Target
+
+LATENCY_BUCKETS_S = [b / 1000 for b in LATENCY_BUCKETS_MS]
+TICK_BUCKETS_S = [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+class Histogram:
+    """Cumulative-on-render Prometheus histogram."""
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def render(self, name: str, labels: Dict[str, str]) -> List[str]:
+        lines = []
+        running = 0
+        for bound, count in zip(self.bounds + [float("inf")], self.counts):
+            running += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{_labels(**labels, le=le)} {running}")
+        lines.append(f"{name}_sum{_labels(**labels) if labels else ''} {self.sum}")
+        lines.append(f"{name}_count{_labels(**labels) if labels else ''} {running}")
+        return lines
+
+class MetricsRegistry:
+    """
+    In-memory snapshot of monitor state in Prometheus text format.
+
+    The monitor pushes updates as it works; scrapes only read this snapshot,
+    so they never trigger probes or disk reads. The rendered text is cached
+    until the next update.
+    """
+    def __init__(self):
+        self.targets: Dict[str, Target] = {}
+        self.up: Dict[str, int] = {}
+        self.strikes: Dict[str, int] = {}
+        self.suppressed: Dict[str, int] = {} # 1 while the target is skipped because a parent is down
+        self.probes: Dict[str, int] = defaultdict(int)
+        self.skipped: Dict[str, int] = defaultdict(int) # probes pruned because a parent was down
+        self.latency: Dict[str, Histogram] = {}
+        self.alerts: Dict[str, int] = defaultdict(int)
+        self.tick_duration = Histogram(TICK_BUCKETS_S)
+        self.last_tick_probes = 0
+        self._cache: Optional[str] = None
+
+    def set_targets(self, targets: Dict[str, Target]):
+        self.targets = dict(targets)
+        for series in (self.up, self.strikes, self.suppressed, self.probes, self.skipped, self.latency):
+            for key in [k for k in series if k not in self.targets]:
+                del series[key]
+        self._cache = None
+
+    def observe_probe(self, key: str, result: ProbeResult, strikes: int):
+        self.up[key] = int(result.up)
+        self.strikes[key] = strikes
+        self.suppressed[key] = 0
+        self.probes[key] += 1
+        if result.up and result.latency_ms is not None:
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS_S)).observe(result.latency_ms / 1000)
+        self._cache = None
+
+    def observe_skip(self, key: str):
+        """A skipped target keeps its last up value; it is only marked suppressed."""
+        self.strikes[key] = 0
+        self.suppressed[key] = 1
+        self.skipped[key] += 1
+        self._cache = None
+
+    def count_alert(self, kind: str):
+        self.alerts[kind] += 1
+        self._cache = None
+
+    def observe_tick(self, seconds: float, probes: int):
+        self.tick_duration.observe(seconds)
+        self.last_tick_probes = probes
+        self._cache = None
+
+    def _target_labels(self, key: str) -> Dict[str, str]:
+        target = self.targets.get(key)
+        if target is None:
+            return {"target": key}
+        return {"target": key, "name": target.name, "host": target.host,
+                "port": str(target.port), "protocol": target.protocol}
+
+    def render(self) -> str:
+        if self._cache is not None:
+            return self._cache
+        lines = [
+            "# HELP talon_targets Number of enabled targets.",
+            "# TYPE talon_targets gauge",
+            f"talon_targets {len(self.targets)}",
+            "# HELP talon_target_up Whether the last probe of the target succeeded.",
+            "# TYPE talon_target_up gauge",
+        ]
+        lines += [f"talon_target_up{_labels(**self._target_labels(k))} {v}" for k, v in self.up.items()]
+        lines += ["# HELP talon_target_strikes Consecutive failed probes.", "# TYPE talon_target_strikes gauge"]
+        lines += [f"talon_target_strikes{_labels(**self._target_labels(k))} {v}" for k, v in self.strikes.items()]
+        lines += ["# HELP talon_target_suppressed Whether the target is skipped because a parent target is down.",
+                  "# TYPE talon_target_suppressed gauge"]
+        lines += [f"talon_target_suppressed{_labels(**self._target_labels(k))} {v}" for k, v in self.suppressed.items()]
+        lines += ["# HELP talon_probes_total Probes run per target.", "# TYPE talon_probes_total counter"]
+        lines += [f"talon_probes_total{_labels(target=k)} {v}" for k, v in self.probes.items()]
+        lines += ["# HELP talon_probes_skipped_total Probes skipped because a parent target was down.",
+                  "# TYPE talon_probes_skipped_total counter"]
+        lines += [f"talon_probes_skipped_total{_labels(target=k)} {v}" for k, v in self.skipped.items()]
+        lines += ["# HELP talon_probe_latency_seconds Time to a healthy probe answer.",
+                  "# TYPE talon_probe_latency_seconds histogram"]
+        for key, histogram in self.latency.items():
+            lines += histogram.render("talon_probe_latency_seconds", {"target": key})
+        lines += ["# HELP talon_alerts_total Alert transitions raised, by kind.", "# TYPE talon_alerts_total counter"]
+        lines += [f"talon_alerts_total{_labels(kind=k)} {v}" for k, v in self.alerts.items()]
+        lines += ["# HELP talon_tick_duration_seconds Wall time of monitor ticks that ran probes.",
+                  "# TYPE talon_tick_duration_seconds histogram"]
+        lines += self.tick_duration.render("talon_tick_duration_seconds", {})
+        lines += ["# HELP talon_tick_probes Probes run by the last tick.", "# TYPE talon_tick_probes gauge",
+                  f"talon_tick_probes {self.last_tick_probes}"]
+        self._cache = "\n".join(lines) + "\n"
+        return self._cache
+
+class MetricsServer:
+    """Minimal asyncio HTTP server exposing GET /metrics on the monitor's event loop."""
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9464):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Metrics endpoint listening on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+            method, path = _request_line(request)
+            if method == "GET" and path.split("?", 1)[0] == "/metrics":
+                status, body = "200 OK", self.registry.render().encode()
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                status, body, content_type = "404 Not Found", b"Not Found\n", "text/plain"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+def _request_line(request: bytes) -> Tuple[str, str]:
+    parts = request.split(b"\r\n", 1)[0].decode("latin-1").split()
+    return (parts[0], parts[1]) if len(parts) >= 2 else ("", "")
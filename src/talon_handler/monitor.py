@@ -1,108 +1,490 @@
-import time
-import psutil
 import asyncio
-from datetime import datetime
-from typing import Dict
-from .discovery import check_service_health
+import copy
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+from .alerts import MAX_MESSAGE_LENGTH, AlertAggregator
 from .config import ConfigManager
-from .constants import COMMON_SERVICES, DASHBOARD_FILE
-from .telegram_bot import send_telegram_alert
+from .constants import HISTORY_FILE, LOCAL_HOSTS
+from .dashboard import DashboardRenderer
+from .discovery import DiscoveryDiff, ListenSocket, diff_listeners, discover_listeners, parse_port_ranges
+from .history import HistoryStore, Summary
+from .log import logger
+from .metrics import MetricsRegistry
+from .probes import Prober, ProbeResult, probe_targets
+from .scheduler import ProbeScheduler
+from .snapshot import StatusSnapshot
+from .stats import MonitorStats, SlowTickProfiler
+from .targets import Target
+from .telegram_bot import TalonBot, send_telegram_alert
+from .workers import ProbePool
 
 class TalonMonitor:
-    def __init__(self):
-        self.config = ConfigManager()
-        self.failure_counters: Dict[int, int] = {} # port -> consecutive failures
-        self.alert_sent: Dict[int, bool] = {} # port -> alert sent status
-
-    def generate_dashboard(self, results: Dict[int, bool]):
-        """Writes the Markdown dashboard."""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        cpu = psutil.cpu_percent()
-        ram = psutil.virtual_memory().percent
-        
-        lines = [
-            "# 🦅 Talon Handler Dashboard",
-            f"**Last Updated:** `{timestamp}`",
-            "",
-            "## 🚀 System Vitals",
-            f"- **CPU Usage:** `{cpu}%`",
-            f"- **RAM Usage:** `{ram}%`",
-            "",
-            "## 📡 Service Status",
-            "| Service | Port | Status |",
-            "| :--- | :--- | :--- |"
-        ]
-        
-        watchlist = self.config.get_watchlist()
-        service_names = self.config.data.get("service_names", {})
-        for port_str, enabled in watchlist.items():
-            if not enabled: continue
-            
-            port = int(port_str)
-            name = service_names.get(port_str, COMMON_SERVICES.get(port, "Unknown"))
-            status_icon = "✅ UP" if results.get(port) else "❌ DOWN"
-            lines.append(f"| {name} | {port} | {status_icon} |")
+    def __init__(self, bot: Optional[TalonBot] = None, workers: Optional[int] = None):
+        self.config = ConfigManager.shared()
+        self.bot = bot
+        self.targets: Dict[str, Target] = {} # enabled targets by key, rebuilt on change
+        self._raw_targets: Optional[list] = None
+        self._intervals: Optional[Dict[str, float]] = None
+        self.paused: Set[str] = set() # keys paused at runtime over the control socket
+        self.parents: Dict[str, List[str]] = {} # key -> keys it depends on
+        self.children: Dict[str, List[str]] = {} # key -> keys that depend on it
+        self._depth: Dict[str, int] = {} # key -> longest parent chain; probes run level by level
+        self.suppressed: Dict[str, str] = {} # key -> name of the down parent it is skipped for
+        self.started_at = time.time()
+        self.scheduler = ProbeScheduler(
+            suspect_interval=float(self.config.data.get("suspect_interval", 5)),
+            backoff_max=float(self.config.data.get("backoff_max", 2.0)),
+            jitter=float(self.config.data.get("schedule_jitter", 0.1)),
+        )
+        self.latest: Dict[str, ProbeResult] = {} # most recent result per target key
+        self.prober = Prober() # keeps HTTP keep-alive pools alive between ticks
+        # Optional worker processes that probe shards of the targets; everything else stays here
+        workers = int(self.config.data.get("probe_workers", 0)) if workers is None else workers
+        self.pool: Optional[ProbePool] = None
+        if workers > 0:
+            self.pool = ProbePool(workers, shard_timeout=float(self.config.data.get("worker_shard_timeout", 60)))
+        self.metrics = MetricsRegistry() # scraped by the optional /metrics endpoint
+        self.snapshot = StatusSnapshot(self) # answers the bot's /status, /down and /history
+        self._on_config_change(self.config)
+        self.config.subscribe(self._on_config_change)
+        self.alerts = AlertAggregator(self.notify, window=float(self.config.data.get("alert_batch_window", 10)))
+        self.failure_counters: Dict[str, int] = {} # target key -> consecutive failures
+        self.alert_sent: Dict[str, bool] = {} # target key -> alert sent status
+        self.slow_counters: Dict[str, int] = {} # target key -> consecutive slow probes
+        self.slow_alert_sent: Dict[str, bool] = {}
+        self.degraded: Set[str] = set() # keys whose latest probe exceeded the latency threshold
+        self.dashboard = DashboardRenderer(
+            min_interval=float(self.config.data.get("dashboard_min_interval", 0)),
+            vitals_bucket=int(self.config.data.get("dashboard_vitals_bucket", 5)),
+        )
+        self.history: Optional[HistoryStore] = None
+        if self.config.data.get("history_enabled", True):
+            self.history = HistoryStore(
+                self.config.data.get("history_file", HISTORY_FILE),
+                raw_retention=float(self.config.data.get("history_raw_retention", 2 * 3600)),
+                minute_retention=float(self.config.data.get("history_minute_retention", 2 * 86400)),
+                hour_retention=float(self.config.data.get("history_hour_retention", 90 * 86400)),
+            )
+        self.summaries: Dict[str, Summary] = {}
+        self._summaries_at = 0.0
+        self._listeners: Optional[Dict[int, ListenSocket]] = None # previous discovery snapshot
+        self.stats = MonitorStats()
+        if bot is not None:
+            self.stats.phases["telegram_send"] = bot.outbound.delivery
+            bot.attach(self.snapshot)
+        self.profiler: Optional[SlowTickProfiler] = None
+        if self.config.data.get("profile_slow_tick_ms"):
+            self.profiler = SlowTickProfiler(float(self.config.data["profile_slow_tick_ms"]))
+
+    def _on_config_change(self, config: ConfigManager):
+        """Rebuilds the probe set when the target list changed and re-syncs intervals."""
+        raw = config.data.get("targets", [])
+        if raw != self._raw_targets:
+            self._raw_targets = copy.deepcopy(raw)
+            self.targets = {t.key: t for t in config.get_targets() if t.enabled}
+            self._build_dependencies()
+            self.latest = {k: v for k, v in self.latest.items() if k in self.targets}
+            self.metrics.set_targets(self.targets)
+            self.paused &= set(self.targets)
+            self.suppressed = {k: v for k, v in self.suppressed.items() if k in self.targets}
+            self.snapshot.touch()
+        self._sync_schedule()
+
+    def _sync_schedule(self):
+        default_interval = float(self.config.data.get("monitoring_interval", 60))
+        intervals = {
+            key: float(t.interval or default_interval)
+            for key, t in self.targets.items() if key not in self.paused
+        }
+        if intervals != self._intervals:
+            self._intervals = intervals
+            self.scheduler.sync(intervals, time.monotonic())
+
+    def _build_dependencies(self):
+        """Resolves each target's parents (by key or name) into edges and probe levels."""
+        by_name: Dict[str, List[str]] = {}
+        for key, t in self.targets.items():
+            by_name.setdefault(t.name, []).append(key)
+        self.parents = {}
+        for key, t in self.targets.items():
+            found = []
+            for ref in t.parents or ():
+                keys = [ref] if ref in self.targets else by_name.get(ref, [])
+                if not keys:
+                    logger.warning(f"{t.name}: parent {ref!r} is unknown or disabled; ignoring it.")
+                found += [k for k in keys if k != key]
+            if found:
+                self.parents[key] = list(dict.fromkeys(found))
+
+        self._depth = {}
+        def depth(key: str, visiting: Set[str]) -> int:
+            if key not in self._depth:
+                visiting.add(key)
+                level = 0
+                for parent in list(self.parents.get(key, ())):
+                    if parent in visiting: # an edge that closes a cycle is dropped
+                        logger.warning(f"{self.targets[key].name}: dependency on {self.targets[parent].name} "
+                                       f"forms a cycle; ignoring it.")
+                        self.parents[key].remove(parent)
+                        continue
+                    level = max(level, depth(parent, visiting) + 1)
+                visiting.discard(key)
+                self._depth[key] = level
+            return self._depth[key]
+        for key in self.targets:
+            depth(key, set())
+        self.parents = {key: parents for key, parents in self.parents.items() if parents}
+
+        self.children = {}
+        for key, parents in self.parents.items():
+            for parent in parents:
+                self.children.setdefault(parent, []).append(key)
+
+    def descendants(self, key: str) -> List[str]:
+        """Every target that depends on `key`, directly or through other targets."""
+        found: Dict[str, None] = {}
+        stack = list(self.children.get(key, ()))
+        while stack:
+            child = stack.pop()
+            if child not in found:
+                found[child] = None
+                stack.extend(self.children.get(child, ()))
+        return list(found)
+
+    def blocked_by(self, key: str) -> Optional[str]:
+        """The failing ancestor that makes probing `key` pointless, if any. Paused parents never block."""
+        for parent in self.parents.get(key, ()):
+            if parent not in self.paused and self.failure_counters.get(parent, 0) > 0:
+                return parent
+            root = self.blocked_by(parent)
+            if root is not None:
+                return root
+        return None
+
+    def resolve(self, ref: str) -> List[str]:
+        """Target keys matching a key, a name or a port number."""
+        return [key for key, t in self.targets.items() if ref in (key, t.name, str(t.port))]
+
+    def pause(self, keys: Iterable[str]):
+        self.paused.update(k for k in keys if k in self.targets)
+        self._sync_schedule()
+        self.snapshot.touch()
+
+    def resume(self, keys: Iterable[str]):
+        self.paused.difference_update(keys)
+        self._sync_schedule()
+        self.snapshot.touch()
+
+    def probe_now(self, keys: Optional[Iterable[str]] = None):
+        """Makes the given (default: all unpaused) targets due on the next loop pass."""
+        keys = self.targets if keys is None else keys
+        self.scheduler.trigger([k for k in keys if k not in self.paused], time.monotonic())
+
+    def status(self) -> Dict[str, Any]:
+        """Live per-target state straight from memory."""
+        rows = []
+        for key, t in self.targets.items():
+            result = self.latest.get(key)
+            rows.append({
+                "key": key, "name": t.name, "host": t.host, "port": t.port, "protocol": t.protocol,
+                "up": None if result is None else result.up,
+                "latency_ms": None if result is None else result.latency_ms,
+                "detail": None if result is None else result.detail,
+                "checked": None if result is None else result.timestamp,
+                "strikes": self.failure_counters.get(key, 0),
+                "alerted": self.alert_sent.get(key, False),
+                "slow": key in self.degraded,
+                "paused": key in self.paused,
+                "blocked_by": self.blocked_by(key),
+                "suppressed": key in self.suppressed,
+            })
+        return {"pid": os.getpid(), "started": self.started_at, "targets": rows}
+
+    async def close(self):
+        """Sends pending alerts and releases probe connections, workers and the history DB."""
+        await self.alerts.flush()
+        self.dashboard.close()
+        await self.prober.close()
+        if self.pool is not None:
+            await asyncio.to_thread(self.pool.close)
+        if self.history is not None:
+            await asyncio.to_thread(self.history.close)
+        self.stats.write()
+
+    def generate_dashboard(self, targets: Iterable[Target], results: Dict[str, ProbeResult]):
+        """Writes the Markdown dashboard if any status or vitals bucket changed."""
+        self.dashboard.render(targets, results, self.summaries, self.degraded, self.suppressed)
+
+    async def record_history(self, results: Dict[str, ProbeResult]):
+        """Persists this tick's results and refreshes the uptime summaries at most once a minute."""
+        if self.history is None:
+            return
+        for key, result in results.items():
+            self.history.record(key, result.up, result.latency_ms, result.timestamp)
+        await asyncio.to_thread(self.history.flush)
+        if time.monotonic() - self._summaries_at >= 60:
+            self.summaries = await asyncio.to_thread(self.history.summaries, list(self.targets))
+            self._summaries_at = time.monotonic()
+            self.snapshot.touch()
+
+    def latency_threshold(self, target: Target) -> Optional[float]:
+        threshold = target.latency_threshold_ms
+        if threshold is None:
+            threshold = self.config.data.get("latency_threshold_ms")
+        return float(threshold) if threshold else None
+
+    def is_suspect(self, key: str) -> bool:
+        """Failing but not yet confirmed, or slow: worth re-checking soon."""
+        failing = 0 < self.failure_counters.get(key, 0) and not self.alert_sent.get(key, False)
+        return failing or (key in self.degraded and not self.slow_alert_sent.get(key, False))
+
+    def process_result(self, target: Target, result: ProbeResult):
+        """Strike system: 3 consecutive failures (or slow responses) raise an alert."""
+        key = target.key
+        if not result.up:
+            self.failure_counters[key] = self.failure_counters.get(key, 0) + 1
+            strikes = self.failure_counters[key]
+            self.degraded.discard(key)
             
-        with open(DASHBOARD_FILE, "w", encoding="utf-8") as f:
-            f.write("\n".join(lines))
+            if strikes == 1:
+                self._suppress_dependents(key)
 
-    async def run_loop(self):
-        """Main monitoring loop."""
+            # Alert if 3+ strikes and we haven't notified yet
+            if strikes >= 3 and not self.alert_sent.get(key, False):
+                dependents = [self.targets[k].name for k in self.descendants(key) if k not in self.paused]
+                if dependents:
+                    # One root-cause message instead of one per dependent
+                    self.alerts.add("root", target, ", ".join(dependents))
+                    self.metrics.count_alert("root")
+                else:
+                    self.alerts.add_down(target, strikes)
+                    self.metrics.count_alert("down")
+                self.alert_sent[key] = True
+            return
+
+        # Reset counter and check for recovery
+        if self.alert_sent.get(key, False):
+            self.alerts.add_recovered(target)
+            self.metrics.count_alert("recovered")
+        self.failure_counters[key] = 0
+        self.alert_sent[key] = False
+
+        threshold = self.latency_threshold(target)
+        if threshold is not None and result.latency_ms is not None and result.latency_ms > threshold:
+            self.degraded.add(key)
+            self.slow_counters[key] = self.slow_counters.get(key, 0) + 1
+            if self.slow_counters[key] >= 3 and not self.slow_alert_sent.get(key, False):
+                self.alerts.add("slow", target, f"{result.latency_ms:.0f} ms > {threshold:.0f} ms")
+                self.metrics.count_alert("slow")
+                self.slow_alert_sent[key] = True
+        else:
+            self.degraded.discard(key)
+            if self.slow_alert_sent.get(key, False):
+                self.alerts.add("normal", target)
+                self.metrics.count_alert("normal")
+            self.slow_counters[key] = 0
+            self.slow_alert_sent[key] = False
+
+    def _suppress_dependents(self, key: str):
+        """A parent just failed: its dependents drop their strikes and any not-yet-sent DOWN alert."""
+        for child in self.descendants(key):
+            self.failure_counters[child] = 0
+            if any([self.alerts.discard(kind, child) for kind in ("down", "root")]):
+                self.alert_sent[child] = False
+
+    def _skip(self, key: str, root: str, now: float):
+        """
+        Stands in for the probe of a target whose parent is down: no connection, no
+        strikes, and its last result is kept. It is reported as suppressed, not DOWN.
+        """
+        self.failure_counters[key] = 0
+        self.degraded.discard(key)
+        self.suppressed[key] = self.targets[root].name
+        self.metrics.observe_skip(key)
+        self.scheduler.reschedule(key, now, suspect=False) # the parent's recovery wakes it early
+
+    async def _probe(self, batch: List[Target]) -> Dict[str, ProbeResult]:
+        options = dict(
+            timeout=float(self.config.data.get("probe_timeout", 1.0)),
+            concurrency=int(self.config.data.get("probe_concurrency", 100)),
+            per_host=int(self.config.data.get("probe_per_host", 20)),
+            default_mode=self.config.data.get("probe_mode", "active"),
+        )
+        if self.pool is not None:
+            return await self.pool.probe(batch, **options)
+        return await probe_targets(batch, prober=self.prober, **options)
+
+    async def rediscover(self) -> Optional[DiscoveryDiff]:
+        """
+        Rescans local listeners and diffs against the previous scan; the first call only
+        records a baseline. Each non-empty diff is logged and sent as one notification.
+        With discovery_auto_enroll, new services are added to the watchlist. Vanished
+        services are only reported: a crashed service disappears from the LISTEN table too.
+        """
+        listeners = await asyncio.to_thread(discover_listeners)
+        ignored = set(parse_port_ranges(str(self.config.data.get("discovery_ignore_ports", ""))))
+        own = os.getpid() # e.g. the metrics endpoint
+        current = {s.port: s for s in listeners if s.port not in ignored and own not in s.pids}
+        previous, self._listeners = self._listeners, current
+        if previous is None:
+            return None
+        diff = diff_listeners(previous, current)
+        if not diff:
+            return None
+
+        targets = self.config.get_targets()
+        watched = {t.port for t in targets if t.host in LOCAL_HOSTS}
+        enrolled = []
+        if self.config.data.get("discovery_auto_enroll", False):
+            new = [Target(port=s.port, name=s.name) for s in diff.added if s.port not in watched]
+            if new:
+                enrolled = [t.port for t in self.config.add_targets(new)]
+        message = diff.describe(watched, enrolled)
+        logger.info(message.replace("\n", " | "))
+        await self.notify(message[:MAX_MESSAGE_LENGTH])
+        return diff
+
+    async def notify(self, message: str):
+        """Sends through the bot's shared outbound queue, or a one-off client without a bot."""
         token = self.config.data.get("telegram_token")
         chat_id = self.config.data.get("chat_id")
-        interval = int(self.config.data.get("monitoring_interval", 60))
+        if not (token and chat_id):
+            return
+        try:
+            if self.bot is not None:
+                await self.bot.send_alert(int(chat_id), message)
+            else:
+                await send_telegram_alert(token, int(chat_id), message)
+            logger.info(f"[ALERT QUEUED] {message.splitlines()[0]}")
+        except Exception as te:
+            logger.warning(f"[ALERT FAILED] {te}")
 
-        while True:
-            try:
-                self.config.reload() # Pick up new watchlist or token changes
-                watchlist = self.config.get_watchlist()
-                results = {}
-                
-                for port_str, enabled in watchlist.items():
-                    if not enabled: continue
-                    
-                    port = int(port_str)
-                    is_up = check_service_health(port)
-                    results[port] = is_up
-                    
-                    # Strike system
-                    if not is_up:
-                        self.failure_counters[port] = self.failure_counters.get(port, 0) + 1
-                        strikes = self.failure_counters[port]
-                        
-                        # Alert if 3+ strikes and we haven't successfully notified yet
-                        if strikes >= 3 and not self.alert_sent.get(port, False):
-                            if token and chat_id:
-                                name = self.config.data.get("service_names", {}).get(port_str, "Unknown")
-                                msg = f"⚠️ ALERT: Service '{name}' on port {port} is DOWN (Strikes: {strikes})."
-                                try:
-                                    await send_telegram_alert(token, int(chat_id), msg)
-                                    self.alert_sent[port] = True
-                                    with open("talon.log", "a") as log:
-                                        log.write(f"{datetime.now()}: [ALERT SENT] Port {port}\n")
-                                except Exception as te:
-                                    with open("talon.log", "a") as log:
-                                        log.write(f"{datetime.now()}: [ALERT FAILED] Port {port}: {te}\n")
+    async def tick(self) -> int:
+        """
+        Probes every target that is due. Returns the number of probes run.
+
+        Due targets are probed level by level along their parent chains, so a
+        target whose parent (or grandparent) is failing is skipped without a
+        probe. A dependent's first failure re-checks its parents right away,
+        and a parent's recovery re-checks its dependents.
+        """
+        now = time.monotonic()
+        next_due = self.scheduler.next_due()
+        pending: Set[str] = set() # popped from the schedule, not yet rescheduled
+        try:
+            due = [key for key in self.scheduler.pop_due(now) if key in self.targets]
+            pending.update(due)
+            if not due:
+                return 0
+            self.stats.record("scan_drift", max(0.0, now - next_due)) # how late the earliest due probe starts
+            if self.profiler is not None:
+                self.profiler.start()
+            started = time.perf_counter()
+            levels: Dict[int, List[str]] = {}
+            for key in due:
+                levels.setdefault(self._depth.get(key, 0), []).append(key)
+            results: Dict[str, ProbeResult] = {}
+            skipped: List[str] = []
+            wake: Set[str] = set()
+            probe_time = process_time = 0.0
+            for level in sorted(levels):
+                batch = []
+                now = time.monotonic()
+                for key in levels[level]:
+                    if key not in self.targets: # removed while an earlier level was probing
+                        pending.discard(key)
+                        continue
+                    root = self.blocked_by(key)
+                    if root is None:
+                        batch.append(self.targets[key])
                     else:
-                        # Reset counter and check for recovery
-                        if self.failure_counters.get(port, 0) >= 3:
-                             if token and chat_id:
-                                name = self.config.data.get("service_names", {}).get(port_str, "Unknown")
-                                try:
-                                    await send_telegram_alert(token, int(chat_id), f"✅ RECOVERED: Service '{name}' on port {port} is back UP.")
-                                except Exception:
-                                    pass
-                        self.failure_counters[port] = 0
-                        self.alert_sent[port] = False
-                
-                self.generate_dashboard(results)
+                        self._skip(key, root, now)
+                        pending.discard(key)
+                        skipped.append(key)
+                if not batch:
+                    continue
+                phase_started = time.perf_counter()
+                level_results = await self._probe(batch)
+                probe_time += time.perf_counter() - phase_started
+
+                phase_started = time.perf_counter()
+                now = time.monotonic()
+                for key, result in level_results.items():
+                    pending.discard(key)
+                    target = self.targets.get(key)
+                    if target is None: continue # removed while probing
+                    was_failing = self.failure_counters.get(key, 0) > 0
+                    self.suppressed.pop(key, None)
+                    self.process_result(target, result)
+                    self.metrics.observe_probe(key, result, self.failure_counters.get(key, 0))
+                    self.scheduler.reschedule(key, now, self.is_suspect(key))
+                    if not result.up and not was_failing:
+                        wake.update(self.parents.get(key, ()))
+                    elif result.up and was_failing:
+                        wake.update(self.descendants(key))
+                self.latest.update(level_results)
+                results.update(level_results)
+                process_time += time.perf_counter() - phase_started
+            self.stats.record("probe", probe_time)
+            self.stats.record("process", process_time)
+            self.probe_now(wake.difference(due))
+            self.snapshot.observe([*results, *skipped])
+
+            with self.stats.phase("history"):
+                await self.record_history(results)
+            with self.stats.phase("dashboard"):
+                self.generate_dashboard(self.targets.values(), self.latest)
+            elapsed = time.perf_counter() - started
+            self.stats.record("tick", elapsed)
+            self.metrics.observe_tick(elapsed, len(results))
+            return len(results)
+        except Exception:
+            # Never drop targets from the schedule
+            for key in pending:
+                self.scheduler.reschedule(key, time.monotonic(), suspect=False)
+            raise
+        finally:
+            # Also on errors: a profile left enabled makes the next start() raise on 3.12+
+            if self.profiler is not None:
+                self.profiler.stop()
+
+    async def run_loop(self):
+        """Main monitoring loop: sleeps until the next target is due, then probes it."""
+        probes = 0
+        last_heartbeat = last_stats = time.monotonic()
+        last_discovery = float("-inf")
+        lag_watch = asyncio.create_task(self.stats.watch_loop_lag())
+
+        try:
+            while True:
+                try:
+                    with self.stats.phase("reload"):
+                        self.config.reload() # Cheap stat; re-parses and re-syncs the schedule only on change
+                    probes += await self.tick()
+
+                    discovery_interval = float(self.config.data.get("discovery_interval", 300))
+                    if discovery_interval > 0 and time.monotonic() - last_discovery >= discovery_interval:
+                        last_discovery = time.monotonic()
+                        await self.rediscover()
+
+                    if time.monotonic() - last_stats >= float(self.config.data.get("stats_interval", 10)):
+                        await asyncio.to_thread(self.stats.write)
+                        last_stats = time.monotonic()
                 
-                # HEARTBEAT
-                with open("talon.log", "a") as log:
-                    log.write(f"{datetime.now()}: Heartbeat - Scan completed ({len(results)} ports checked).\n")
+                    # HEARTBEAT, once per monitoring interval
+                    if time.monotonic() - last_heartbeat >= float(self.config.data.get("monitoring_interval", 60)):
+                        timings = self.stats.log_line("tick", "loop_lag", "scan_drift")
+                        logger.info(f"Heartbeat - {probes} probes across {len(self.targets)} targets. {timings}".rstrip())
+                        probes = 0
+                        last_heartbeat = time.monotonic()
             
-            except Exception as e:
-                with open("talon.log", "a") as log:
-                    log.write(f"{datetime.now()}: Loop Error: {e}\n")
+                except Exception as e:
+                    logger.error(f"Loop Error: {e}")
             
-            await asyncio.sleep(interval)
+                # Wake for the next due target, but at least once a second to notice config changes
+                next_due = self.scheduler.next_due()
+                delay = 1.0 if next_due is None else next_due - time.monotonic()
+                await asyncio.sleep(min(max(delay, 0.0), 1.0))
+        finally:
+            lag_watch.cancel()
@@ -0,0 +1,377 @@
+import asyncio
+import calendar
+import errno
+import ipaddress
+import random
+import ssl
+import struct
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterable, Iterator, Optional, Set, Tuple
+import psutil
+from .constants import LOCAL_HOSTS
+from .discovery import read_listen_table
+from .targets import Target
+
+# Bind addresses that accept connections for any local address of their family
+_WILDCARDS = {"0.0.0.0", "::"}
+_LOOPBACK_ALIASES = {"localhost": "127.0.0.1"}
+
+@dataclass
+class ProbeResult:
+    """Outcome of a single probe."""
+    up: bool
+    latency_ms: Optional[float] = None # time to a healthy answer, measured with perf_counter
+    error: Optional[int] = None # errno of the failure, if any
+    timestamp: float = field(default_factory=time.time)
+    detail: Optional[str] = None # protocol-specific note, e.g. "HTTP 502" or "cert expires in 9d"
+
+def _elapsed_ms(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
+
+async def probe_tcp(host: str, port: int, timeout: float = 1.0) -> ProbeResult:
+    """Times a TCP connect without blocking the event loop."""
+    started = time.perf_counter()
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except asyncio.TimeoutError:
+        return ProbeResult(up=False, error=errno.ETIMEDOUT)
+    except OSError as e:
+        return ProbeResult(up=False, error=e.errno)
+    latency_ms = _elapsed_ms(started)
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return ProbeResult(up=True, latency_ms=latency_ms)
+
+ProbeFunc = Callable[["Prober", Target, float], Awaitable[ProbeResult]]
+PROBES: Dict[str, ProbeFunc] = {}
+
+def register_probe(*protocols: str):
+    """Registers a probe implementation for one or more target protocols."""
+    def decorator(func: ProbeFunc) -> ProbeFunc:
+        for protocol in protocols:
+            PROBES[protocol] = func
+        return func
+    return decorator
+
+class Prober:
+    """
+    Dispatches targets to the probe registered for their protocol and owns
+    state that should outlive a single tick, i.e. the keep-alive HTTP pools.
+    Must be used from a single event loop; call close() when done.
+    """
+    def __init__(self):
+        self._http_clients: Dict[bool, "httpx.AsyncClient"] = {} # verify_tls -> client
+
+    def http_client(self, verify: bool):
+        if verify not in self._http_clients:
+            import httpx
+            self._http_clients[verify] = httpx.AsyncClient(
+                verify=verify,
+                follow_redirects=True,
+                limits=httpx.Limits(max_keepalive_connections=100, keepalive_expiry=300),
+            )
+        return self._http_clients[verify]
+
+    async def probe(self, target: Target, timeout: float = 1.0) -> ProbeResult:
+        func = PROBES.get(target.protocol)
+        if func is None:
+            return ProbeResult(up=False, error=errno.EPROTONOSUPPORT, detail=f"unknown protocol '{target.protocol}'")
+        try:
+            return await func(self, target, timeout)
+        except Exception as e:
+            # A misconfigured target must not fail the whole batch
+            return ProbeResult(up=False, error=errno.EINVAL, detail=f"{type(e).__name__}: {e}")
+
+    async def close(self):
+        for client in self._http_clients.values():
+            await client.aclose()
+        self._http_clients.clear()
+
+@register_probe("tcp")
+async def _tcp(prober: Prober, target: Target, timeout: float) -> ProbeResult:
+    return await probe_tcp(target.host, target.port, timeout)
+
+@register_probe("http", "https")
+async def _http(prober: Prober, target: Target, timeout: float) -> ProbeResult:
+    """Status (and optionally body) check over a pooled keep-alive connection."""
+    import httpx
+    host = f"[{target.host}]" if ":" in target.host else target.host # IPv6 literals need brackets
+    url = f"{target.protocol}://{host}:{target.port}{target.path or '/'}"
+    started = time.perf_counter()
+    try:
+        response = await prober.http_client(target.verify_tls).get(url, timeout=timeout)
+    except httpx.TimeoutException:
+        return ProbeResult(up=False, error=errno.ETIMEDOUT)
+    except httpx.HTTPError as e:
+        return ProbeResult(up=False, error=errno.ECONNREFUSED, detail=str(e) or type(e).__name__)
+    latency_ms = _elapsed_ms(started)
+
+    detail = f"HTTP {response.status_code}"
+    if target.expect_status is not None:
+        healthy = response.status_code == target.expect_status
+    else:
+        healthy = response.status_code < 400
+    if healthy and target.expect_body and target.expect_body not in response.text:
+        healthy, detail = False, f"{detail}, body mismatch"
+    return ProbeResult(up=healthy, latency_ms=latency_ms, detail=detail)
+
+def _tls_context(verify: bool) -> ssl.SSLContext:
+    context = ssl.create_default_context()
+    if not verify:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+def _der_items(der: bytes, offset: int, end: int) -> Iterator[Tuple[int, int, int]]:
+    """(tag, start, end) of each DER element between offset and end."""
+    while offset < end:
+        tag, length = der[offset], der[offset + 1]
+        offset += 2
+        if length & 0x80:
+            size = length & 0x7F
+            length = int.from_bytes(der[offset:offset + size], "big")
+            offset += size
+        yield tag, offset, offset + length
+        offset += length
+
+def cert_not_after(der: bytes) -> Optional[float]:
+    """
+    Expiry (epoch seconds) of a DER certificate. The ssl module only decodes
+    verified certificates, so self-signed ones are walked down to validity.notAfter here.
+    """
+    try:
+        _, start, end = next(_der_items(der, 0, len(der))) # Certificate
+        _, start, end = next(_der_items(der, start, end)) # TBSCertificate
+        fields = list(_der_items(der, start, end))
+        if fields[0][0] == 0xA0: # explicit version
+            fields = fields[1:]
+        _, start, end = fields[3] # serialNumber, signature, issuer, validity
+        tag, start, end = list(_der_items(der, start, end))[1]
+        fmt = "%y%m%d%H%M%SZ" if tag == 0x17 else "%Y%m%d%H%M%SZ" # UTCTime or GeneralizedTime
+        return calendar.timegm(time.strptime(der[start:end].decode("ascii"), fmt))
+    except (StopIteration, IndexError, ValueError):
+        return None
+
+@register_probe("tls")
+async def _tls(prober: Prober, target: Target, timeout: float) -> ProbeResult:
+    """Completes a TLS handshake and checks how long the certificate has left."""
+    started = time.perf_counter()
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(target.host, target.port, ssl=_tls_context(target.verify_tls),
+                                    server_hostname=target.host),
+            timeout,
+        )
+    except asyncio.TimeoutError:
+        return ProbeResult(up=False, error=errno.ETIMEDOUT)
+    except ssl.SSLError as e:
+        return ProbeResult(up=False, error=errno.EPROTO, detail=e.reason or str(e))
+    except OSError as e:
+        return ProbeResult(up=False, error=e.errno)
+    latency_ms = _elapsed_ms(started)
+
+    ssl_object = writer.get_extra_info("ssl_object")
+    der = ssl_object.getpeercert(binary_form=True) if ssl_object is not None else None
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except (OSError, ssl.SSLError):
+        pass
+
+    not_after = cert_not_after(der) if der else None
+    if not_after is None:
+        detail = "cert expiry unknown" if target.cert_min_days is not None else None
+        return ProbeResult(up=True, latency_ms=latency_ms, detail=detail)
+    days_left = (not_after - time.time()) / 86400
+    detail = f"cert expires in {days_left:.0f}d"
+    healthy = target.cert_min_days is None or days_left >= target.cert_min_days
+    return ProbeResult(up=healthy, latency_ms=latency_ms, detail=detail)
+
+def build_dns_query(name: str, query_id: int) -> bytes:
+    """A minimal recursive A query for `name`."""
+    header = struct.pack("!HHHHHH", query_id, 0x0100, 1, 0, 0, 0)
+    labels = b"".join(bytes([len(part)]) + part.encode("idna") for part in name.rstrip(".").split(".") if part)
+    return header + labels + b"\x00" + struct.pack("!HH", 1, 1)
+
+def _check_dns_answer(answer: bytes, query_id: int, started: float) -> ProbeResult:
+    if len(answer) < 12:
+        return ProbeResult(up=False, error=errno.EPROTO, detail="short DNS answer")
+    answer_id, flags = struct.unpack("!HH", answer[:4])
+    rcode = flags & 0x000F
+    if answer_id != query_id or not flags & 0x8000:
+        return ProbeResult(up=False, error=errno.EPROTO, detail="malformed DNS answer")
+    # NOERROR and NXDOMAIN both prove the resolver works; SERVFAIL/REFUSED do not
+    healthy = rcode in (0, 3)
+    return ProbeResult(up=healthy, latency_ms=_elapsed_ms(started), detail=f"rcode {rcode}")
+
+class _DnsUdpProtocol(asyncio.DatagramProtocol):
+    def __init__(self, answer: asyncio.Future):
+        self.answer = answer
+
+    def datagram_received(self, data, addr):
+        if not self.answer.done():
+            self.answer.set_result(data)
+
+    def error_received(self, exc):
+        if not self.answer.done():
+            self.answer.set_exception(exc)
+
+@register_probe("dns")
+async def _dns_udp(prober: Prober, target: Target, timeout: float) -> ProbeResult:
+    loop = asyncio.get_running_loop()
+    query_id = random.randrange(1 << 16)
+    answer: asyncio.Future = loop.create_future()
+    started = time.perf_counter()
+    try:
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _DnsUdpProtocol(answer), remote_addr=(target.host, target.port))
+    except OSError as e:
+        return ProbeResult(up=False, error=e.errno)
+    try:
+        transport.sendto(build_dns_query(target.query or "example.com", query_id))
+        data = await asyncio.wait_for(answer, timeout)
+    except asyncio.TimeoutError:
+        return ProbeResult(up=False, error=errno.ETIMEDOUT)
+    except OSError as e:
+        return ProbeResult(up=False, error=e.errno)
+    finally:
+        transport.close()
+    return _check_dns_answer(data, query_id, started)
+
+@register_probe("dns-tcp")
+async def _dns_tcp(prober: Prober, target: Target, timeout: float) -> ProbeResult:
+    query_id = random.randrange(1 << 16)
+    query = build_dns_query(target.query or "example.com", query_id)
+    started = time.perf_counter()
+
+    async def _exchange() -> bytes:
+        reader, writer = await asyncio.open_connection(target.host, target.port)
+        try:
+            writer.write(struct.pack("!H", len(query)) + query)
+            await writer.drain()
+            (length,) = struct.unpack("!H", await reader.readexactly(2))
+            return await reader.readexactly(length)
+        finally:
+            writer.close()
+
+    try:
+        data = await asyncio.wait_for(_exchange(), timeout)
+    except asyncio.TimeoutError:
+        return ProbeResult(up=False, error=errno.ETIMEDOUT)
+    except asyncio.IncompleteReadError:
+        return ProbeResult(up=False, error=errno.EPROTO, detail="truncated DNS answer")
+    except OSError as e:
+        return ProbeResult(up=False, error=e.errno)
+    return _check_dns_answer(data, query_id, started)
+
+# Refusals are reported with the Winsock errno on Windows
+_REFUSED = {errno.ECONNREFUSED, getattr(errno, "WSAECONNREFUSED", errno.ECONNREFUSED)}
+
+@register_probe("host")
+async def _host(prober: Prober, target: Target, timeout: float) -> ProbeResult:
+    """Host reachability without ICMP: an accepted or a refused connect both prove the host answered."""
+    started = time.perf_counter()
+    result = await probe_tcp(target.host, target.port, timeout)
+    if result.up or result.error in _REFUSED:
+        return ProbeResult(up=True, latency_ms=_elapsed_ms(started))
+    return ProbeResult(up=False, error=result.error, detail="unreachable")
+
+@register_probe("process")
+async def _process(prober: Prober, target: Target, timeout: float) -> ProbeResult:
+    """Local process check by name (target.query), e.g. dockerd or docker-proxy."""
+    import psutil
+    started = time.perf_counter()
+    def _running() -> bool:
+        return any(p.info["name"] == target.query for p in psutil.process_iter(["name"]))
+    if await asyncio.to_thread(_running):
+        return ProbeResult(up=True, latency_ms=_elapsed_ms(started))
+    return ProbeResult(up=False, detail="not running")
+
+def check_passive(targets: Iterable[Target], table: Dict[int, Set[str]]) -> Dict[str, ProbeResult]:
+    """
+    Resolves local TCP targets against one snapshot of the kernel's LISTEN table,
+    without opening a connection to any of them.
+    """
+    results = {}
+    for target in targets:
+        host = _LOOPBACK_ALIASES.get(target.host, target.host)
+        bound = table.get(target.port, set())
+        listening = bool(bound & (_WILDCARDS | {host, f"::ffff:{host}"}))
+        results[target.key] = ProbeResult(
+            up=listening,
+            error=None if listening else errno.ECONNREFUSED,
+            detail="passive" if listening else "not listening",
+        )
+    return results
+
+_interfaces: Tuple[float, Set[str]] = (float("-inf"), set()) # (read at, addresses), refreshed every minute
+
+def _interface_addresses() -> Set[str]:
+    global _interfaces
+    if time.monotonic() - _interfaces[0] > 60:
+        addresses = {a.address.split("%")[0] for nic in psutil.net_if_addrs().values() for a in nic}
+        _interfaces = (time.monotonic(), addresses)
+    return _interfaces[1]
+
+def is_local_host(host: str) -> bool:
+    """Loopback names and addresses, or an address of one of this machine's interfaces."""
+    if host in LOCAL_HOSTS:
+        return True
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False # other hostnames may resolve anywhere
+    return address.is_loopback or host in _interface_addresses()
+
+def is_passive(target: Target, default_mode: str = "active") -> bool:
+    """
+    Passive checks only apply to plain TCP targets on this machine: the LISTEN
+    table says nothing about other hosts, so those are always connected to.
+    """
+    return (target.protocol == "tcp" and (target.mode or default_mode) == "passive"
+            and is_local_host(target.host))
+
+async def probe_targets(
+    targets: Iterable[Target],
+    timeout: float = 1.0,
+    concurrency: int = 100,
+    per_host: int = 20,
+    prober: Optional[Prober] = None,
+    default_mode: str = "active",
+) -> Dict[str, ProbeResult]:
+    """
+    Checks all targets at once, with at most `concurrency` probes in flight
+    overall and `per_host` against any single host. Passive targets are all
+    answered from a single read of the LISTEN table.
+    Returns a dict of target key -> ProbeResult, so a sweep takes roughly one timeout.
+    Pass a long-lived `prober` to reuse keep-alive connections between calls.
+    """
+    targets = list(targets)
+    passive = [t for t in targets if is_passive(t, default_mode)]
+    active = [t for t in targets if not is_passive(t, default_mode)]
+    results: Dict[str, ProbeResult] = {}
+    if passive:
+        results.update(check_passive(passive, await asyncio.to_thread(read_listen_table)))
+    if not active:
+        return results
+
+    owned = prober is None
+    prober = prober or Prober()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    host_limits: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(max(1, per_host)))
+
+    async def _probe(target: Target) -> Tuple[str, ProbeResult]:
+        async with host_limits[target.host], semaphore:
+            return target.key, await prober.probe(target, timeout)
+
+    try:
+        results.update(await asyncio.gather(*(_probe(t) for t in active)))
+    finally:
+        if owned:
+            await prober.close()
+    return results
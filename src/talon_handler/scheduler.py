@@ -0,0 +1,93 @@
+import heapq
+import random
+from typing import Dict, Iterable, List, Optional, Tuple
+
+class ProbeScheduler:
+    """
+    Timer heap that gives every target its own next-due time.
+
+    Suspect targets (failing but not yet confirmed, or slow) are re-checked
+    every `suspect_interval` seconds so strikes accumulate in seconds instead
+    of whole intervals. Healthy targets back off geometrically from their base
+    interval up to `base * backoff_max`. Every interval gets +/- `jitter`
+    (a fraction) so targets don't stay in lockstep.
+    """
+    def __init__(self, suspect_interval: float = 5.0, backoff_max: float = 2.0, jitter: float = 0.1):
+        self.suspect_interval = suspect_interval
+        self.backoff_max = max(1.0, backoff_max)
+        self.jitter = jitter
+        self._heap: List[Tuple[float, str]] = []
+        self._due: Dict[str, float] = {} # key -> live due time; heap entries not matching it are stale
+        self._base: Dict[str, float] = {} # key -> configured interval
+        self._current: Dict[str, float] = {} # key -> current (backed-off) interval
+
+    def __len__(self) -> int:
+        return len(self._base)
+
+    def _push(self, key: str, due: float):
+        self._due[key] = due
+        heapq.heappush(self._heap, (due, key))
+
+    def _jittered(self, interval: float) -> float:
+        return interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def sync(self, intervals: Dict[str, float], now: float):
+        """
+        Aligns the schedule with the current targets (key -> base interval).
+        New targets are due immediately; removed ones are forgotten; targets whose
+        interval changed are rescheduled so the change takes effect without a restart.
+        """
+        for key in list(self._base):
+            if key not in intervals:
+                self._due.pop(key, None)
+                del self._base[key]
+                self._current.pop(key, None)
+        for key, interval in intervals.items():
+            if key not in self._base:
+                self._base[key] = self._current[key] = interval
+                self._push(key, now)
+            elif self._base[key] != interval:
+                self._base[key] = self._current[key] = interval
+                # In-flight targets (popped, not yet rescheduled) pick it up on reschedule
+                if key in self._due:
+                    self._push(key, min(self._due[key], now + self._jittered(interval)))
+        # Drop stale heap entries once they dominate the heap
+        if len(self._heap) > 2 * len(self._due) + 64:
+            self._heap = [(due, key) for key, due in self._due.items()]
+            heapq.heapify(self._heap)
+
+    def next_due(self) -> Optional[float]:
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> List[str]:
+        """Returns (and unschedules) every target due at or before `now`."""
+        keys = []
+        while True:
+            due = self.next_due()
+            if due is None or due > now:
+                return keys
+            _, key = heapq.heappop(self._heap)
+            del self._due[key]
+            keys.append(key)
+
+    def reschedule(self, key: str, now: float, suspect: bool):
+        """Schedules the next probe of `key` after a result came in."""
+        if key not in self._base:
+            return
+        base = self._base[key]
+        if suspect:
+            self._current[key] = base
+            interval = min(self.suspect_interval, base)
+        else:
+            self._current[key] = min(self._current[key] * 1.5, base * self.backoff_max)
+            interval = self._current[key]
+        self._push(key, now + self._jittered(interval))
+
+    def trigger(self, keys: Iterable[str], now: float):
+        """Makes the given targets due immediately."""
+        for key in keys:
+            if key in self._base:
+                self._current[key] = self._base[key]
+                self._push(key, now)
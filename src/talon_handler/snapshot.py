@@ -0,0 +1,135 @@
+import bisect
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from .alerts import MAX_MESSAGE_LENGTH
+from .history import LATENCY_BUCKETS_MS
+
+CACHE_SIZE = 128
+
+def _latency(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.0f} ms" if value >= 1 else f"{value:.1f} ms"
+
+def _fit(header: str, lines: List[str]) -> str:
+    """Joins lines under the header, cut to one Telegram message."""
+    text = header
+    for i, line in enumerate(lines):
+        if len(text) + len(line) + 40 > MAX_MESSAGE_LENGTH:
+            return f"{text}\n… and {len(lines) - i} more"
+        text += "\n" + line
+    return text
+
+class StatusSnapshot:
+    """
+    Chat-facing view of the monitor's in-memory state. TalonMonitor calls
+    observe()/touch() as results come in; replies are rendered once per state
+    change and served from cache until the next one, so chat commands never
+    probe, read the config or block the monitor loop.
+    """
+    def __init__(self, monitor):
+        self.monitor = monitor
+        self.version = 0
+        self._rows: Dict[str, Tuple] = {}
+        self._cache: Dict[Tuple[str, str], str] = {}
+
+    def touch(self):
+        self.version += 1
+        self._cache.clear()
+
+    def _row_state(self, key: str) -> Tuple:
+        m = self.monitor
+        result = m.latest.get(key)
+        if key in m.suppressed:
+            return ("suppressed", m.suppressed[key], key in m.paused)
+        if result is None:
+            return (None,)
+        bucket = None if result.latency_ms is None else bisect.bisect_left(LATENCY_BUCKETS_MS, result.latency_ms)
+        return (result.up, result.detail, bucket, key in m.degraded, m.failure_counters.get(key, 0), key in m.paused)
+
+    def observe(self, keys: Iterable[str]):
+        """Bumps the version if any of these targets changed visibly."""
+        changed = False
+        for key in keys:
+            state = self._row_state(key)
+            if self._rows.get(key) != state:
+                self._rows[key] = state
+                changed = True
+        if changed:
+            self.touch()
+
+    def _cached(self, name: str, arg: str, render: Callable[[], str]) -> str:
+        text = self._cache.get((name, arg))
+        if text is None:
+            if len(self._cache) >= CACHE_SIZE:
+                self._cache.clear()
+            text = self._cache[(name, arg)] = render()
+        return text
+
+    def _line(self, key: str) -> Tuple[int, str]:
+        """(sort order, text) for one target: down first, paused last."""
+        m = self.monitor
+        t = m.targets[key]
+        where = f"{t.name} ({t.host}:{t.port})"
+        result = m.latest.get(key)
+        if key in m.paused:
+            return 4, f"⏸ {where} paused"
+        if key in m.suppressed:
+            return 2, f"⏭ {where} not probed ({m.suppressed[key]} down)"
+        if result is None:
+            return 2, f"… {where} pending"
+        if not result.up:
+            strikes = m.failure_counters.get(key, 0)
+            detail = f" ({result.detail})" if result.detail else ""
+            return 0, f"❌ {where} DOWN{detail}, {strikes} strike{'s' if strikes != 1 else ''}"
+        if key in m.degraded:
+            return 1, f"🐢 {where} SLOW, {_latency(result.latency_ms)}"
+        return 3, f"✅ {where} {_latency(result.latency_ms)}"
+
+    def status(self) -> str:
+        return self._cached("status", "", self._render_status)
+
+    def _render_status(self) -> str:
+        lines = sorted(self._line(key) for key in self.monitor.targets)
+        counts = [0] * 5
+        for order, _ in lines:
+            counts[order] += 1
+        header = (f"🦅 Talon: {len(lines)} targets: ✅ {counts[3]} up, ❌ {counts[0]} down, "
+                  f"🐢 {counts[1]} slow, ⏸ {counts[4]} paused")
+        return _fit(header, [text for _, text in lines])
+
+    def down(self) -> str:
+        return self._cached("down", "", self._render_down)
+
+    def _render_down(self) -> str:
+        lines = sorted(line for line in map(self._line, self.monitor.targets) if line[0] <= 1)
+        if not lines:
+            return f"✅ All {len(self.monitor.targets)} services are UP."
+        return _fit(f"⚠️ {len(lines)} service{'s' if len(lines) != 1 else ''} need attention:",
+                    [text for _, text in lines])
+
+    def history(self, ref: str) -> str:
+        return self._cached("history", ref, lambda: self._render_history(ref))
+
+    def _render_history(self, ref: str) -> str:
+        m = self.monitor
+        if not ref:
+            return "Usage: /history <service name, key or port>"
+        keys = m.resolve(ref)
+        if not keys:
+            return f"No target matches '{ref}'."
+        if m.history is None:
+            return "Probe history is disabled (history_enabled is false)."
+        blocks = []
+        for key in keys:
+            t = m.targets[key]
+            summary = m.summaries.get(key)
+            result = m.latest.get(key)
+            block = [f"📈 {t.name} ({key})"]
+            if summary is None or not summary.samples:
+                block.append("No samples in the last 24h yet.")
+            else:
+                block.append(f"Uptime (24h): {summary.uptime:.2f}% over {summary.samples} checks")
+                if summary.p50_ms is not None:
+                    block.append(f"Latency p50 / p99: ≤{summary.p50_ms:.0f} / ≤{summary.p99_ms:.0f} ms")
+            if result is not None:
+                block.append(f"Last check: {'UP, ' + _latency(result.latency_ms) if result.up else 'DOWN'}")
+            blocks.append("\n".join(block))
+        return _fit(blocks[0], ["\n" + block for block in blocks[1:]])
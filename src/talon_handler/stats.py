@@ -0,0 +1,122 @@
+import asyncio
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Optional
+from .constants import STATS_FILE
+from .log import logger
+from .utils import atomic_write
+
+class RollingStats:
+    """Keeps the last `window` samples (in seconds) and reports p50/p95/max."""
+    def __init__(self, window: int = 512):
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def summary(self) -> Dict[str, float]:
+        """Summary in milliseconds."""
+        if not self.samples:
+            return {"count": 0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        ordered = sorted(self.samples)
+        def pick(q: float) -> float:
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+        return {"count": len(ordered), "p50_ms": pick(0.5), "p95_ms": pick(0.95), "max_ms": ordered[-1] * 1000}
+
+class MonitorStats:
+    """
+    Self-instrumentation for the monitor: per-phase tick timings, event-loop
+    lag and scan drift (how late due probes start). Snapshots are written
+    atomically to `path` for `talon stats`.
+    """
+    def __init__(self, path: str = STATS_FILE):
+        self.path = path
+        self.phases: Dict[str, RollingStats] = {}
+
+    def record(self, name: str, seconds: float):
+        self.phases.setdefault(name, RollingStats()).add(seconds)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def snapshot(self) -> Dict:
+        return {
+            "updated": time.time(),
+            "pid": os.getpid(),
+            "phases": {name: stats.summary() for name, stats in self.phases.items()},
+        }
+
+    def write(self):
+        try:
+            atomic_write(self.path, json.dumps(self.snapshot(), indent=2))
+        except OSError as e:
+            logger.warning(f"Could not write stats: {e}")
+
+    def log_line(self, *names: str) -> str:
+        parts = []
+        for name in names:
+            if name in self.phases:
+                s = self.phases[name].summary()
+                parts.append(f"{name} p50={s['p50_ms']:.1f} p95={s['p95_ms']:.1f} max={s['max_ms']:.1f} ms")
+        return ", ".join(parts)
+
+    async def watch_loop_lag(self, interval: float = 0.5):
+        """Records how late a fixed sleep wakes up; anything blocking the loop shows up here."""
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.record("loop_lag", max(0.0, time.perf_counter() - started - interval))
+
+class SlowTickProfiler:
+    """
+    Opt-in: profiles every tick with cProfile and keeps the profile only when
+    the tick took longer than `threshold_ms`. Dumps go to `talon_profile_<ts>.prof`
+    with the top functions logged; at most one dump per `min_gap` seconds.
+    """
+    def __init__(self, threshold_ms: float, directory: str = ".", min_gap: float = 60.0):
+        self.threshold = threshold_ms / 1000
+        self.directory = directory
+        self.min_gap = min_gap
+        self._last_dump = float("-inf")
+        self._profile: Optional[cProfile.Profile] = None
+        self._started = 0.0
+
+    def start(self):
+        self._profile = cProfile.Profile()
+        self._started = time.perf_counter()
+        self._profile.enable()
+
+    def stop(self) -> Optional[str]:
+        """Stops profiling; returns the dump path if the tick was slow enough to keep."""
+        if self._profile is None:
+            return None
+        self._profile.disable()
+        profile, self._profile = self._profile, None
+        elapsed = time.perf_counter() - self._started
+        if elapsed < self.threshold or time.monotonic() - self._last_dump < self.min_gap:
+            return None
+        self._last_dump = time.monotonic()
+        path = os.path.join(self.directory, f"talon_profile_{int(time.time())}.prof")
+        profile.dump_stats(path)
+        top = io.StringIO()
+        pstats.Stats(profile, stream=top).sort_stats("cumulative").print_stats(15)
+        logger.warning(f"Slow tick ({elapsed * 1000:.0f} ms), profile saved to {path}\n{top.getvalue()}")
+        return path
+
+def read_stats(path: str = STATS_FILE) -> Optional[Dict]:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
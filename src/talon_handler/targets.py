@@ -0,0 +1,56 @@
+from dataclasses import dataclass, asdict, fields
+from typing import Any, Dict, List, Optional
+from .constants import COMMON_SERVICES, DEFAULT_HOST
+
+_CORE_FIELDS = ("port", "host", "protocol", "name", "enabled")
+
+@dataclass
+class Target:
+    """A single monitored endpoint: (host, port, protocol, name)."""
+    port: int
+    host: str = DEFAULT_HOST
+    protocol: str = "tcp"
+    name: str = "Unknown"
+    enabled: bool = True
+    latency_threshold_ms: Optional[float] = None # overrides the global latency_threshold_ms
+    interval: Optional[float] = None # overrides the global monitoring_interval
+    # Protocol-specific probe options (see probes.py)
+    path: Optional[str] = None # http/https: request path
+    expect_status: Optional[int] = None # http/https: required status (default: any below 400)
+    expect_body: Optional[str] = None # http/https: substring the body must contain
+    query: Optional[str] = None # dns/dns-tcp: name to resolve; process: process name to look for
+    cert_min_days: Optional[int] = None # https/tls: fail when the certificate expires sooner
+    verify_tls: bool = True # https/tls: set False for self-signed certificates
+    mode: Optional[str] = None # "active" (connect) or "passive" (listen table); default: probe_mode
+    parents: Optional[List[str]] = None # keys or names of targets this one depends on
+
+    @property
+    def key(self) -> str:
+        """Stable identifier used for strike counters and probe results."""
+        if self.protocol == "process":
+            return f"process://{self.host}/{self.query}"
+        return f"{self.protocol}://{self.host}:{self.port}{self.path or ''}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        # Optional settings are only written when they differ from the default
+        data = asdict(self)
+        return {
+            f.name: data[f.name] for f in fields(self)
+            if f.name in _CORE_FIELDS or data[f.name] != f.default
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Target":
+        known = {f.name for f in fields(cls)}
+        values = {k: v for k, v in data.items() if k in known}
+        values["port"] = int(values["port"])
+        return cls(**values)
+
+def migrate_watchlist(watchlist: Dict[str, bool], service_names: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Converts the legacy port-keyed watchlist/service_names pair into target dicts."""
+    targets = []
+    for port_str, enabled in watchlist.items():
+        port = int(port_str)
+        name = service_names.get(port_str, COMMON_SERVICES.get(port, "Unknown"))
+        targets.append(Target(port=port, name=name, enabled=bool(enabled)).to_dict())
+    return targets
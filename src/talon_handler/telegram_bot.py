@@ -1,15 +1,22 @@
 import asyncio
 import logging
+import time
+import warnings
+from typing import Dict, Optional, Tuple
 from telegram import Update
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
 from telegram.ext import ApplicationBuilder, ContextTypes, CommandHandler
 from .config import ConfigManager
+from .log import logger
+from .stats import RollingStats
 
 # Disable verbose logging from library
 logging.getLogger("httpx").setLevel(logging.WARNING)
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Binds the chat_id using the Ghost Auth OTP."""
-    config = ConfigManager()
+    config = ConfigManager.shared()
+    config.reload() # Only re-parses if `talon code` wrote a new OTP
     
     if not context.args:
         await update.message.reply_text("Please provide the 6-digit auth code: /start <CODE>")
@@ -19,25 +26,154 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     pending_otp = config.data.get("pending_otp")
 
     if pending_otp and user_code == pending_otp:
-        config.data["chat_id"] = update.effective_chat.id
-        config.data.pop("pending_otp", None)
-        config.save()
+        config.update({"chat_id": update.effective_chat.id}, remove=["pending_otp"])
         await update.message.reply_text("✅ Talon Ghost Auth successful. Your Chat ID is now bound for alerts.")
     else:
         await update.message.reply_text("❌ Invalid or expired auth code.")
 
+def _bound_chat(update: Update) -> bool:
+    """Only the chat bound through Ghost Auth may query state. Uses the in-memory config, no reload."""
+    chat_id = ConfigManager.shared().data.get("chat_id")
+    return chat_id is not None and str(update.effective_chat.id) == str(chat_id)
+
+async def _reply_from_snapshot(update: Update, context: ContextTypes.DEFAULT_TYPE, render):
+    if not _bound_chat(update):
+        await update.message.reply_text("❌ This chat is not bound. Use /start <CODE> first.")
+        return
+    snapshot = context.bot_data.get("snapshot")
+    if snapshot is None:
+        await update.message.reply_text("The monitor is still starting, try again in a moment.")
+        return
+    await update.message.reply_text(render(snapshot))
+
+async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Every target's current state."""
+    await _reply_from_snapshot(update, context, lambda s: s.status())
+
+async def down(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Only the targets that are down or slow."""
+    await _reply_from_snapshot(update, context, lambda s: s.down())
+
+async def history(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """24h uptime and latency of one service: /history <name, key or port>."""
+    ref = " ".join(context.args or [])
+    await _reply_from_snapshot(update, context, lambda s: s.history(ref))
+
+class OutboundQueue:
+    """
+    Serialises outgoing messages through one shared, pooled Bot.
+
+    Sends are spaced to respect Telegram's limits (about one message per
+    second per chat, 30 per second overall) and retried with exponential
+    backoff, honouring RetryAfter from the API. Enqueueing never blocks the
+    caller on the network.
+    """
+    def __init__(self, bot, per_chat_interval: float = 1.0, global_rate: float = 30.0,
+                 max_retries: int = 5, backoff: float = 1.0):
+        self.bot = bot
+        self.per_chat_interval = per_chat_interval
+        self.global_interval = 1.0 / global_rate if global_rate > 0 else 0.0
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.queue: "asyncio.Queue[Tuple[int, str]]" = asyncio.Queue()
+        self._chat_next: Dict[int, float] = {}
+        self._global_next = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self.delivery = RollingStats() # seconds per successful send_message call
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._worker())
+
+    async def send(self, chat_id: int, text: str):
+        await self.queue.put((chat_id, text))
+
+    async def drain(self, timeout: Optional[float] = None):
+        """Waits until every queued message has been delivered or given up on."""
+        await asyncio.wait_for(self.queue.join(), timeout)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _throttle(self, chat_id: int):
+        now = time.monotonic()
+        ready = max(self._chat_next.get(chat_id, 0.0), self._global_next)
+        if ready > now:
+            await asyncio.sleep(ready - now)
+            now = time.monotonic()
+        self._chat_next[chat_id] = now + self.per_chat_interval
+        self._global_next = now + self.global_interval
+
+    async def _deliver(self, chat_id: int, text: str):
+        for attempt in range(self.max_retries):
+            await self._throttle(chat_id)
+            try:
+                started = time.perf_counter()
+                await self.bot.send_message(chat_id=chat_id, text=text)
+                self.delivery.add(time.perf_counter() - started)
+                return
+            except RetryAfter as e:
+                with warnings.catch_warnings():
+                    # PTB is moving retry_after from int to timedelta; both are handled below
+                    warnings.simplefilter("ignore")
+                    delay = e.retry_after
+                delay = delay.total_seconds() if hasattr(delay, "total_seconds") else float(delay)
+            except (BadRequest, Forbidden) as e:
+                # Permanent (chat not found, message too long, bot blocked): retrying only stalls the queue
+                logger.warning(f"[ALERT FAILED] {e}: {text}")
+                return
+            except NetworkError:
+                delay = min(self.backoff * 2 ** attempt, 60.0)
+            await asyncio.sleep(delay)
+        logger.warning(f"[ALERT FAILED] Gave up after {self.max_retries} attempts: {text}")
+
+    async def _worker(self):
+        while True:
+            chat_id, text = await self.queue.get()
+            try:
+                await self._deliver(chat_id, text)
+            except Exception as e:
+                logger.warning(f"[ALERT FAILED] {e}")
+            finally:
+                self.queue.task_done()
+
 class TalonBot:
     def __init__(self, token: str):
         self.application = ApplicationBuilder().token(token).build()
         self.application.add_handler(CommandHandler("start", start))
+        self.application.add_handler(CommandHandler("status", status))
+        self.application.add_handler(CommandHandler("down", down))
+        self.application.add_handler(CommandHandler("history", history))
+        # Alerts share the application's pooled HTTP client instead of opening their own
+        self.outbound = OutboundQueue(self.application.bot)
+
+    def attach(self, snapshot):
+        """Gives the chat commands the monitor's StatusSnapshot to answer from."""
+        self.application.bot_data["snapshot"] = snapshot
 
     async def run(self):
         """Runs the bot polling."""
         await self.application.initialize()
+        self.outbound.start()
         await self.application.start()
         await self.application.updater.start_polling()
         
+    async def send_alert(self, chat_id: int, message: str):
+        """Queues a message for rate-limited delivery through the shared client."""
+        await self.outbound.send(chat_id, message)
+
     async def stop(self):
+        try:
+            await self.outbound.drain(timeout=10)
+        except asyncio.TimeoutError:
+            pass
+        await self.outbound.stop()
         await self.application.updater.stop()
         await self.application.stop()
         await self.application.shutdown()
@@ -0,0 +1,35 @@
+import os
+import tempfile
+from pathlib import Path
+from typing import Union
+
+def atomic_write(path: Union[str, Path], text: str, fsync: bool = False):
+    """
+    Writes text to a temp file next to `path` and renames it into place,
+    so readers only ever see the old or the new file, never a partial one.
+    """
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class LazyConsole:
+    """Stands in for rich's Console and imports rich on first use, so light CLI commands start fast."""
+    def __init__(self, **kwargs):
+        self._kwargs = kwargs
+        self._console = None
+
+    def __getattr__(self, name: str):
+        if self._console is None:
+            from rich.console import Console
+            self._console = Console(**self._kwargs)
+        return getattr(self._console, name)
@@ -0,0 +1,134 @@
+import asyncio
+import math
+import multiprocessing
+import signal
+import zlib
+from typing import Dict, List, Optional, Tuple
+from .log import logger
+from .probes import Prober, ProbeResult, probe_targets
+from .targets import Target
+
+# (up, latency_ms, error, timestamp, detail): what a worker sends back per target
+CompactResult = Tuple[bool, Optional[float], Optional[int], float, Optional[str]]
+
+def _worker_main(conn):
+    """Worker process: probes whatever shard it is sent, reusing one Prober between shards."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN) # Ctrl+C is handled by the coordinator
+    asyncio.run(_serve(conn))
+
+async def _serve(conn):
+    prober = Prober()
+    try:
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                return
+            if request is None:
+                return
+            targets, options = request
+            results = await probe_targets(targets, prober=prober, **options)
+            conn.send({key: (r.up, r.latency_ms, r.error, r.timestamp, r.detail) for key, r in results.items()})
+    finally:
+        await prober.close()
+
+class WorkerDied(RuntimeError):
+    pass
+
+class _Worker:
+    def __init__(self, context, index: int):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child,), name=f"talon-probe-{index}", daemon=True)
+        self.process.start()
+        child.close()
+
+    def request(self, targets: List[Target], options: Dict, timeout: float) -> Dict[str, CompactResult]:
+        """Blocking round trip; run it in a thread."""
+        try:
+            self.conn.send((targets, options))
+            if not self.conn.poll(timeout):
+                raise WorkerDied(f"{self.process.name} did not answer within {timeout:.0f}s")
+            return self.conn.recv()
+        except (EOFError, OSError) as e:
+            raise WorkerDied(f"{self.process.name} died: {e!r}") from e
+
+    def close(self, timeout: float = 2.0):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
+        self.conn.close()
+
+class ProbePool:
+    """
+    Spreads probing over `size` worker processes. Targets are sharded by a stable
+    hash of their key, so each target keeps hitting the same worker (and its
+    keep-alive pools). Workers only probe; strikes, alerts, history and the
+    dashboard stay in the coordinating TalonMonitor. A worker that dies or hangs
+    is replaced and its shard retried once on the fresh process.
+    """
+    def __init__(self, size: int, shard_timeout: float = 60.0):
+        self.size = max(1, size)
+        self.shard_timeout = shard_timeout
+        self._context = multiprocessing.get_context("spawn") # never fork a process with a running loop
+        self._workers: List[Optional[_Worker]] = [None] * self.size
+        self.restarts = 0
+
+    def shard(self, key: str) -> int:
+        return zlib.crc32(key.encode()) % self.size
+
+    def _worker(self, index: int) -> _Worker:
+        worker = self._workers[index]
+        if worker is None or not worker.process.is_alive():
+            if worker is not None:
+                self.restarts += 1
+                logger.warning(f"Probe worker {index} exited (code {worker.process.exitcode}); restarting it.")
+                worker.close(timeout=0)
+            worker = self._workers[index] = _Worker(self._context, index)
+        return worker
+
+    async def _discard(self, index: int):
+        worker = self._workers[index]
+        if worker is not None:
+            self._workers[index] = None
+            self.restarts += 1
+            await asyncio.to_thread(worker.close, 1.0)
+
+    async def _probe_shard(self, index: int, targets: List[Target], options: Dict) -> Dict[str, ProbeResult]:
+        for attempt in range(2):
+            worker = self._worker(index)
+            try:
+                compact = await asyncio.to_thread(worker.request, targets, options, self.shard_timeout)
+                return {key: ProbeResult(*values) for key, values in compact.items()}
+            except WorkerDied as e:
+                logger.warning(f"{e}; restarting it.")
+                await self._discard(index)
+                if attempt:
+                    raise
+
+    async def probe(self, targets: List[Target], timeout: float = 1.0, concurrency: int = 100,
+                    per_host: int = 20, default_mode: str = "active") -> Dict[str, ProbeResult]:
+        """Same contract as probe_targets; the concurrency limits are split across the workers."""
+        shards: Dict[int, List[Target]] = {}
+        for target in targets:
+            shards.setdefault(self.shard(target.key), []).append(target)
+        options = {
+            "timeout": timeout,
+            "concurrency": math.ceil(concurrency / self.size),
+            "per_host": math.ceil(per_host / self.size),
+            "default_mode": default_mode,
+        }
+        results: Dict[str, ProbeResult] = {}
+        for part in await asyncio.gather(*(self._probe_shard(i, shard, options) for i, shard in shards.items())):
+            results.update(part)
+        return results
+
+    def close(self):
+        for index, worker in enumerate(self._workers):
+            if worker is not None:
+                worker.close()
+                self._workers[index] = None
@@ -1,10 +1,43 @@
 import pytest
-from talon_handler.config import generate_otp
-from talon_handler.discovery import scan_local_ports
+import asyncio
+import json
+import socket
+import subprocess
+import time
+import sys
+from talon_handler.config import generate_otp, ConfigManager
+from talon_handler.discovery import scan_local_ports, DiscoveryEngine, ListenSocket, sweep_ports, parse_port_ranges
+from talon_handler.probes import ProbeResult, Prober, is_passive, probe_targets
+from talon_handler.targets import Target
+from talon_handler.dashboard import DashboardRenderer
+from talon_handler.telegram_bot import OutboundQueue
+from talon_handler.alerts import AlertAggregator
+from talon_handler.history import HistoryStore
+from talon_handler.scheduler import ProbeScheduler
+from talon_handler.log import logger, setup_logging
+from talon_handler.metrics import MetricsRegistry, MetricsServer
+from talon_handler.stats import MonitorStats, SlowTickProfiler, read_stats
+from talon_handler.workers import ProbePool
+from talon_handler.control import ControlError, ControlUnavailable, request
+from talon_handler.control_server import ControlServer
+from telegram.error import BadRequest, NetworkError, RetryAfter
 from talon_handler.main import app
 from typer.testing import CliRunner
 from talon_handler import __version__
 
+@pytest.fixture
+def monitor_config(tmp_path, monkeypatch):
+    """Writes a talon_config.json with these targets and options in a fresh cwd; returns TalonMonitor."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ConfigManager, "_shared", {})
+
+    def setup(targets=(), **options):
+        config = {"targets": [t.to_dict() for t in targets], **options}
+        (tmp_path / "talon_config.json").write_text(json.dumps(config))
+        from talon_handler.monitor import TalonMonitor
+        return TalonMonitor
+    return setup
+
 def test_otp_generation():
     otp = generate_otp()
     assert len(otp) == 6
@@ -18,6 +51,704 @@ def test_discovery_structure():
         assert isinstance(port, int)
         assert isinstance(name, str)
 
+def test_discovery_resolves_each_pid_once(monkeypatch):
+    from collections import namedtuple
+    import psutil
+    Addr = namedtuple("Addr", "ip port")
+    Conn = namedtuple("Conn", "family laddr status pid")
+    conns = [
+        Conn(socket.AF_INET, Addr("0.0.0.0", 8096), "LISTEN", 100),
+        Conn(socket.AF_INET6, Addr("::", 8096), "LISTEN", 100),
+        Conn(socket.AF_INET, Addr("0.0.0.0", 8920), "LISTEN", 100),
+        Conn(socket.AF_INET, Addr("10.0.0.2", 5555), "ESTABLISHED", 100),
+    ]
+    lookups = []
+
+    class FakeProcess:
+        def __init__(self, pid):
+            lookups.append(pid)
+        def create_time(self):
+            return 1.0
+        def name(self):
+            lookups.append("name")
+            return "docker-proxy"
+
+    monkeypatch.setattr(psutil, "net_connections", lambda kind: conns)
+    monkeypatch.setattr(psutil, "Process", FakeProcess)
+    engine = DiscoveryEngine()
+    found = engine.scan()
+    engine.scan()
+
+    assert [(s.port, s.name) for s in found] == [(8096, "docker-proxy (Jellyfin)"), (8920, "docker-proxy (Jellyfin (HTTPS))")]
+    assert found[0].families == ["IPv4", "IPv6"] and found[0].addresses == ["0.0.0.0", "::"]
+    # One Process per PID per scan, and name() only once thanks to the cache
+    assert lookups == [100, "name", 100]
+
+def test_sweep_ports_finds_listeners_and_reports_progress():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    port = listener.getsockname()[1]
+    seen = []
+    try:
+        ports = parse_port_ranges(f"{port - 50}-{port + 50}")
+        found = asyncio.run(sweep_ports("127.0.0.1", ports, concurrency=16, progress=lambda d, t: seen.append((d, t))))
+    finally:
+        listener.close()
+    assert port in found
+    assert len(seen) == len(ports) and seen[-1] == (len(ports), len(ports))
+
+def test_probe_targets_concurrent():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    open_port = listener.getsockname()[1]
+
+    # Bind and release to get a port that is (almost certainly) closed
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        closed_port = s.getsockname()[1]
+
+    up, down = Target(port=open_port), Target(port=closed_port, host="localhost")
+    try:
+        results = asyncio.run(probe_targets([up, down], timeout=0.5, concurrency=1))
+    finally:
+        listener.close()
+    assert results[up.key].up and results[up.key].latency_ms is not None
+    assert not results[down.key].up and results[down.key].error is not None
+
+def test_probe_pool_shards_and_restarts_dead_workers():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(64)
+    port = listener.getsockname()[1]
+    # Same port under distinct paths gives distinct keys, spread over both workers
+    targets = [Target(port=port, path=f"/{i}", name=f"svc-{i}") for i in range(8)]
+    pool = ProbePool(2, shard_timeout=30)
+
+    async def scenario():
+        first = await pool.probe(targets, timeout=1.0)
+        pool._workers[pool.shard(targets[0].key)].process.kill()
+        return first, await pool.probe(targets, timeout=1.0)
+
+    try:
+        first, second = asyncio.run(scenario())
+    finally:
+        pool.close()
+        listener.close()
+    assert {pool.shard(t.key) for t in targets} == {0, 1}
+    assert all(r.up for r in first.values()) and set(first) == {t.key for t in targets}
+    assert all(r.up for r in second.values()) and len(second) == len(targets)
+    assert pool.restarts == 1
+
+def test_passive_targets_use_listen_table_without_connecting():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    open_port = listener.getsockname()[1]
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        closed_port = s.getsockname()[1]
+
+    up = Target(port=open_port, mode="passive")
+    down = Target(port=closed_port, host="localhost")
+    try:
+        results = asyncio.run(probe_targets([up, down], default_mode="passive"))
+        listener.setblocking(False)
+        with pytest.raises(BlockingIOError):
+            listener.accept() # nobody connected
+    finally:
+        listener.close()
+    assert results[up.key].up and results[up.key].latency_ms is None
+    assert not results[down.key].up
+    # The local LISTEN table says nothing about other hosts
+    assert not is_passive(Target(port=open_port, host="10.99.99.99"), default_mode="passive")
+
+def test_http_probe_reuses_keepalive_connections():
+    connections = []
+
+    async def handle(reader, writer):
+        connections.append(writer)
+        while True:
+            request = await reader.readuntil(b"\r\n\r\n")
+            status = b"502 Bad Gateway" if b"/broken" in request else b"200 OK"
+            body = b"jellyfin ok"
+            writer.write(b"HTTP/1.1 " + status + b"\r\nContent-Length: %d\r\n\r\n" % len(body) + body)
+            await writer.drain()
+
+    async def scenario():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        healthy = Target(port=port, protocol="http", path="/health", expect_body="ok")
+        broken = Target(port=port, protocol="http", path="/broken")
+        prober = Prober()
+        try:
+            first = await probe_targets([healthy], prober=prober)
+            second = await probe_targets([healthy], prober=prober)
+            failing = await probe_targets([broken], prober=prober)
+        finally:
+            await prober.close()
+            server.close()
+        return first[healthy.key], second[healthy.key], failing[broken.key]
+
+    first, second, failing = asyncio.run(scenario())
+    assert first.up and second.up and first.detail == "HTTP 200"
+    assert not failing.up and failing.detail == "HTTP 502"
+    assert len(connections) == 1
+
+def test_probe_errors_stay_per_target():
+    async def handle(reader, writer):
+        await reader.readuntil(b"\r\n\r\n")
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n")
+        await writer.drain()
+        writer.close()
+
+    async def scenario():
+        server = await asyncio.start_server(handle, "::1", 0)
+        port = server.sockets[0].getsockname()[1]
+        v6 = Target(port=port, host="::1", protocol="http")
+        bad = Target(port=70000, name="typo") # raises inside the probe
+        try:
+            results = await probe_targets([v6, bad])
+        finally:
+            server.close()
+        return results[v6.key], results[bad.key]
+
+    if not socket.has_ipv6:
+        pytest.skip("no IPv6")
+    v6, bad = asyncio.run(scenario())
+    assert v6.up and v6.detail == "HTTP 200"
+    assert not bad.up and "OverflowError" in bad.detail
+
+def test_tls_expiry_is_checked_without_verification(tmp_path):
+    import shutil, ssl
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl CLI not available")
+    cert, key = tmp_path / "cert.pem", tmp_path / "key.pem"
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "5",
+                    "-subj", "/CN=localhost", "-keyout", str(key), "-out", str(cert)],
+                   check=True, capture_output=True)
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+
+    async def scenario():
+        server = await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1", 0, ssl=context)
+        port = server.sockets[0].getsockname()[1]
+        self_signed = Target(port=port, protocol="tls", verify_tls=False, cert_min_days=14)
+        try:
+            return (await probe_targets([self_signed], timeout=5))[self_signed.key]
+        finally:
+            server.close()
+
+    result = asyncio.run(scenario())
+    assert not result.up and result.detail == "cert expires in 5d"
+
+def test_dns_probe_against_stand_in_resolver():
+    class Resolver(asyncio.DatagramProtocol):
+        def connection_made(self, transport):
+            self.transport = transport
+
+        def datagram_received(self, data, addr):
+            # Echo the question back as an answer with the given RCODE
+            rcode = 2 if b"broken" in data else 0
+            flags = 0x8180 | rcode
+            self.transport.sendto(data[:2] + flags.to_bytes(2, "big") + data[4:], addr)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(Resolver, local_addr=("127.0.0.1", 0))
+        port = transport.get_extra_info("sockname")[1]
+        ok = Target(port=port, protocol="dns", query="pi.hole")
+        broken = Target(port=port, protocol="dns", query="broken.lan")
+        try:
+            return (await probe_targets([ok], timeout=1))[ok.key], (await probe_targets([broken], timeout=1))[broken.key]
+        finally:
+            transport.close()
+
+    ok, broken = asyncio.run(scenario())
+    assert ok.up and ok.latency_ms is not None
+    assert not broken.up and broken.detail == "rcode 2"
+
+def test_legacy_watchlist_migrates_to_targets(tmp_path):
+    path = tmp_path / "talon_config.json"
+    path.write_text(json.dumps({
+        "watchlist": {"22": True, "8096": False},
+        "service_names": {"22": "sshd"},
+    }))
+    cfg = ConfigManager(str(path))
+    targets = {t.port: t for t in cfg.get_targets()}
+    assert targets[22].name == "sshd" and targets[22].enabled
+    assert targets[8096].name == "Jellyfin" and not targets[8096].enabled
+    assert targets[22].host == "127.0.0.1" and targets[22].protocol == "tcp"
+
+    saved = json.loads(path.read_text())
+    assert "watchlist" not in saved and "service_names" not in saved
+    assert len(saved["targets"]) == 2
+
+def test_dashboard_rewrites_only_on_change(tmp_path):
+    path = tmp_path / "talon_dashboard.md"
+    # A bucket wider than 100% keeps vitals noise out of the comparison
+    renderer = DashboardRenderer(str(path), vitals_bucket=101)
+    target = Target(port=22, name="sshd")
+
+    assert renderer.render([target], {target.key: ProbeResult(up=True, latency_ms=0.4)})
+    assert "| sshd | 127.0.0.1 | 22 | ✅ UP | 0.4 ms |" in path.read_text(encoding="utf-8")
+    # Same latency bucket, so no rewrite
+    assert not renderer.render([target], {target.key: ProbeResult(up=True, latency_ms=0.6)})
+
+    assert renderer.render([target], {target.key: ProbeResult(up=False)})
+    assert "❌ DOWN" in path.read_text(encoding="utf-8")
+    assert not list(tmp_path.glob("*.tmp"))
+
+def test_throttled_dashboard_change_is_written_later(tmp_path):
+    path = tmp_path / "talon_dashboard.md"
+    renderer = DashboardRenderer(str(path), min_interval=0.2, vitals_bucket=101)
+    target = Target(port=22, name="sshd")
+
+    async def scenario():
+        assert renderer.render([target], {target.key: ProbeResult(up=False)})
+        # Recovery inside min_interval is throttled, and no further render() comes
+        assert not renderer.render([target], {target.key: ProbeResult(up=True, latency_ms=1)})
+        throttled = path.read_text(encoding="utf-8")
+        await asyncio.sleep(0.4)
+        return throttled, path.read_text(encoding="utf-8")
+
+    throttled, later = asyncio.run(scenario())
+    assert "❌ DOWN" in throttled and "✅ UP" in later
+
+def test_outbound_queue_retries_through_shared_bot():
+    class FakeBot:
+        def __init__(self):
+            self.sent = []
+            self.failures = [RetryAfter(0), NetworkError("reset"), None, BadRequest("Chat not found")]
+            self.calls = 0
+
+        async def send_message(self, chat_id, text):
+            self.calls += 1
+            failure = self.failures.pop(0) if self.failures else None # None: this call succeeds
+            if failure is not None:
+                raise failure
+            self.sent.append((chat_id, text))
+
+    async def scenario():
+        bot = FakeBot()
+        outbound = OutboundQueue(bot, per_chat_interval=0, backoff=0)
+        outbound.start()
+        for i in range(3):
+            await outbound.send(42, f"msg {i}")
+        await outbound.drain(timeout=5)
+        await outbound.stop()
+        return bot.sent, bot.calls
+
+    sent, calls = asyncio.run(scenario())
+    # msg 1 hits a permanent BadRequest: dropped after one attempt instead of retried
+    assert sent == [(42, "msg 0"), (42, "msg 2")] and calls == 5
+
+def test_alert_aggregator_batches_transitions():
+    sent = []
+
+    async def send(text):
+        sent.append(text)
+
+    async def scenario():
+        alerts = AlertAggregator(send, window=0.05)
+        for port in (22, 80, 443):
+            alerts.add_down(Target(port=port, host="10.0.0.5", name=f"svc{port}"), 3)
+        flapping = Target(port=8096, name="Jellyfin")
+        alerts.add_down(flapping, 3)
+        alerts.add_recovered(flapping)
+        await asyncio.sleep(0.2)
+
+    asyncio.run(scenario())
+    assert sent == ["⚠️ 3 services DOWN on 10.0.0.5: svc22 (22), svc80 (80), svc443 (443)"]
+
+def test_config_reload_only_on_change(tmp_path):
+    path = tmp_path / "talon_config.json"
+    path.write_text(json.dumps({"targets": []}))
+    cfg = ConfigManager(str(path))
+    seen = []
+    cfg.subscribe(lambda c: seen.append(len(c.get_targets())))
+
+    assert not cfg.reload()
+    assert seen == []
+
+    other = ConfigManager(str(path))
+    other.update_targets([Target(port=22)])
+    assert cfg.reload()
+    assert seen == [1]
+    assert not cfg.reload()
+
+def test_config_update_is_read_modify_write(tmp_path):
+    path = tmp_path / "talon_config.json"
+    daemon = ConfigManager(str(path))
+    cli = ConfigManager(str(path))
+
+    cli.set_otp()
+    # The daemon's in-memory copy is stale, but its write must not drop the OTP
+    daemon.update({"chat_id": 42})
+    saved = json.loads(path.read_text())
+    assert saved["chat_id"] == 42 and len(saved["pending_otp"]) == 6
+
+    daemon.update({}, remove=["pending_otp"])
+    assert "pending_otp" not in json.loads(path.read_text())
+    assert not list(tmp_path.glob("*.tmp"))
+
+def test_config_audit_keeps_concurrent_writes(tmp_path, monkeypatch):
+    path = tmp_path / "talon_config.json"
+    path.write_text(json.dumps({"telegram_token": "old", "monitoring_interval": 60}))
+    cli = ConfigManager(str(path))
+    answers = iter(["R", "new", "K"])
+
+    def ask(*args, **kwargs):
+        ConfigManager(str(path)).update({"chat_id": 42}) # the daemon binds a chat mid-audit
+        return next(answers)
+
+    import rich.prompt
+    monkeypatch.setattr(rich.prompt.Prompt, "ask", ask)
+    cli.interactive_audit()
+    saved = json.loads(path.read_text())
+    assert saved["telegram_token"] == "new" and saved["monitoring_interval"] == 60 and saved["chat_id"] == 42
+
+def test_filter_keeps_targets_added_meanwhile(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ConfigManager().update_targets([Target(port=22, name="sshd"), Target(port=80, name="nginx")])
+    answers = iter([False, True])
+
+    def confirm(*args, **kwargs):
+        daemon = ConfigManager() # auto-enrolls a service while the prompts are open
+        daemon.add_targets([Target(port=6379, name="redis-server")])
+        return next(answers)
+
+    import typer
+    monkeypatch.setattr(typer, "confirm", confirm)
+    assert CliRunner().invoke(app, ["filter"]).exit_code == 0
+    saved = {t["name"]: t["enabled"] for t in json.loads((tmp_path / "talon_config.json").read_text())["targets"]}
+    assert saved == {"sshd": False, "nginx": True, "redis-server": True}
+
+def test_history_rollups_give_uptime_and_percentiles(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    for latency in (1.5, 3.0, 40.0):
+        store.record("tcp://127.0.0.1:22", True, latency_ms=latency)
+    store.record("tcp://127.0.0.1:22", False)
+    store.flush()
+
+    summary = store.summaries(["tcp://127.0.0.1:22", "tcp://127.0.0.1:80"])["tcp://127.0.0.1:22"]
+    store.close()
+    assert summary.samples == 4
+    assert summary.uptime == 75.0
+    assert summary.p50_ms == 5 and summary.p99_ms == 50
+
+def test_latency_threshold_raises_slow_alert(monitor_config):
+    TalonMonitor = monitor_config(latency_threshold_ms=500)
+
+    async def scenario():
+        monitor = TalonMonitor()
+        target = Target(port=445, name="NAS")
+        for _ in range(3):
+            monitor.process_result(target, ProbeResult(up=True, latency_ms=900))
+        events = {kind: list(p) for kind, p in monitor.alerts.pending.items() if p}
+        monitor.process_result(target, ProbeResult(up=True, latency_ms=3))
+        return events, monitor.alerts.pending["slow"], monitor.degraded
+
+    events, pending_slow, degraded = asyncio.run(scenario())
+    assert events == {"slow": [Target(port=445, name="NAS").key]}
+    # Recovering inside the batch window cancels the pending SLOW alert
+    assert not pending_slow and not degraded
+
+def test_scheduler_rechecks_suspects_and_backs_off_healthy():
+    scheduler = ProbeScheduler(suspect_interval=5, backoff_max=2.0, jitter=0)
+    scheduler.sync({"a": 60.0, "b": 60.0}, now=0)
+    assert sorted(scheduler.pop_due(0)) == ["a", "b"]
+
+    scheduler.reschedule("a", now=0, suspect=True)
+    scheduler.reschedule("b", now=0, suspect=False)
+    assert scheduler.pop_due(5) == ["a"]
+    assert scheduler.next_due() == 90 # 60s base, backed off 1.5x
+    scheduler.reschedule("a", now=5, suspect=False)
+
+    # Interval changes apply without a restart
+    scheduler.sync({"a": 60.0, "b": 10.0}, now=6)
+    assert scheduler.pop_due(16) == ["b"]
+    scheduler.sync({"a": 60.0}, now=17)
+    assert len(scheduler) == 1
+
+def test_logging_is_queued_rotated_and_structured(tmp_path):
+    path = tmp_path / "talon.log"
+    writer = setup_logging(str(path), json_lines=True, max_bytes=2000, backup_count=2)
+    for i in range(100):
+        logger.info(f"Heartbeat {i}", extra={"fields": {"probes": i}})
+    writer.stop()
+
+    assert (tmp_path / "talon.log.1").exists() and not (tmp_path / "talon.log.3").exists()
+    lines = []
+    for name in ("talon.log.2", "talon.log.1", "talon.log"):
+        lines += (tmp_path / name).read_text().splitlines()
+    entries = [json.loads(line) for line in lines]
+    assert entries[0]["level"] == "INFO" and "probes" in entries[0]
+    assert entries[-1]["message"] == "Heartbeat 99"
+
+def test_metrics_endpoint_serves_snapshot():
+    target = Target(port=8080, name='say "hi"')
+    registry = MetricsRegistry()
+    registry.set_targets({target.key: target})
+    registry.observe_probe(target.key, ProbeResult(up=True, latency_ms=12), strikes=0)
+    registry.count_alert("down")
+    registry.observe_tick(0.2, 1)
+
+    async def scrape(path):
+        server = MetricsServer(registry, port=0)
+        await server.start()
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: x\r\n\r\n".encode())
+        response = await reader.read()
+        writer.close()
+        await server.stop()
+        return response.decode()
+
+    body = asyncio.run(scrape("/metrics"))
+    assert body.startswith("HTTP/1.1 200")
+    assert f'talon_target_up{{target="{target.key}",name="say \\"hi\\"",' in body
+    assert f'talon_probe_latency_seconds_bucket{{target="{target.key}",le="+Inf"}} 1' in body
+    assert 'talon_alerts_total{kind="down"} 1' in body
+    assert "talon_tick_duration_seconds_count 1" in body
+    assert asyncio.run(scrape("/")).startswith("HTTP/1.1 404")
+
+def test_stats_phases_and_slow_tick_profile(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    stats = MonitorStats()
+    for ms in range(1, 101):
+        stats.record("tick", ms / 1000)
+    with stats.phase("dashboard"):
+        pass
+    stats.write()
+    snapshot = read_stats()
+    assert snapshot["phases"]["tick"]["count"] == 100
+    assert snapshot["phases"]["tick"]["p95_ms"] == pytest.approx(96)
+    assert snapshot["phases"]["tick"]["max_ms"] == pytest.approx(100)
+    assert "dashboard" in snapshot["phases"]
+    result = CliRunner().invoke(app, ["stats"])
+    assert result.exit_code == 0 and "tick" in result.output
+
+    profiler = SlowTickProfiler(threshold_ms=0, directory=str(tmp_path))
+    profiler.start()
+    sum(range(1000))
+    assert profiler.stop() is not None
+    profiler.start()
+    assert profiler.stop() is None # one dump per min_gap
+
+def test_failed_tick_stops_profiler_and_keeps_schedule(monitor_config):
+    TalonMonitor = monitor_config([Target(port=8080, name="web")], history_enabled=False, profile_slow_tick_ms=60000)
+
+    async def scenario():
+        monitor = TalonMonitor()
+        async def fake_probe(batch):
+            return {t.key: ProbeResult(up=True, latency_ms=1) for t in batch}
+        def broken_dashboard(*args):
+            raise OSError("disk full")
+        monitor._probe = fake_probe
+        monitor.generate_dashboard = broken_dashboard
+        with pytest.raises(OSError):
+            await monitor.tick()
+        return monitor
+
+    monitor = asyncio.run(scenario())
+    assert monitor.profiler._profile is None
+    assert len(monitor.scheduler) == 1 and monitor.scheduler.next_due() is not None
+
+def test_control_socket_rpcs(tmp_path, monitor_config):
+    TalonMonitor = monitor_config([Target(port=8080, name="web"), Target(port=5432, name="db")], history_enabled=False)
+
+    with pytest.raises(ControlUnavailable):
+        request("status")
+
+    async def scenario():
+        monitor = TalonMonitor()
+        monitor.scheduler.pop_due(float("inf"))
+        stop = asyncio.Event()
+        server = ControlServer(monitor, stop.set)
+        await server.start()
+        call = lambda cmd, **args: asyncio.to_thread(request, cmd, **args)
+        status = await call("status")
+        paused = await call("pause", target="db")
+        scheduled_while_paused = len(monitor.scheduler)
+        with pytest.raises(ControlError):
+            await call("pause", target="nope")
+        await call("resume", target="5432")
+        await call("rescan", target="web")
+        due = sorted(monitor.scheduler.pop_due(time.monotonic()))
+        shutdown = asyncio.create_task(call("shutdown"))
+        await stop.wait()
+        server.stopped.set()
+        result = await shutdown
+        await server.stop()
+        return status, paused, scheduled_while_paused, due, result
+
+    status, paused, scheduled_while_paused, due, result = asyncio.run(scenario())
+    assert [row["name"] for row in status["targets"]] == ["web", "db"]
+    assert status["targets"][0]["up"] is None and status["targets"][0]["strikes"] == 0
+    db, web = Target(port=5432, name="db").key, Target(port=8080, name="web").key
+    assert paused == {"paused": [db]} and scheduled_while_paused == 1
+    assert due == sorted([db, web]) # resumed targets are due at once, rescan made web due
+    assert result == {"stopped": True} and not (tmp_path / "talon.sock").exists()
+
+def test_status_snapshot_renders_once_per_change(monitor_config):
+    web, db = Target(port=8080, name="web"), Target(port=5432, name="db")
+    TalonMonitor = monitor_config([web, db])
+
+    async def scenario():
+        monitor = TalonMonitor()
+        snapshot = monitor.snapshot
+        results = {web.key: ProbeResult(up=True, latency_ms=3), db.key: ProbeResult(up=False, detail="refused")}
+        for key, result in results.items():
+            monitor.process_result(monitor.targets[key], result)
+        monitor.latest.update(results)
+        snapshot.observe(results)
+        first, down = snapshot.status(), snapshot.down()
+        version = snapshot.version
+        # Same state again (latency in the same bucket): cached text, no re-render
+        monitor.latest[web.key] = ProbeResult(up=True, latency_ms=3.2)
+        snapshot.observe([web.key])
+        cached = snapshot.status()
+        monitor.latest[db.key] = ProbeResult(up=True, latency_ms=4)
+        monitor.process_result(monitor.targets[db.key], monitor.latest[db.key])
+        snapshot.observe([db.key])
+        history = snapshot.history("5432")
+        monitor.history.close()
+        return first, down, version, cached, snapshot.version, snapshot.down(), history
+
+    first, down, version, cached, new_version, recovered, history = asyncio.run(scenario())
+    assert first.startswith("🦅 Talon: 2 targets: ✅ 1 up, ❌ 1 down")
+    assert first.splitlines()[1].startswith("❌ db") # down targets come first
+    assert "db (127.0.0.1:5432) DOWN (refused), 1 strike" in down and "web" not in down
+    assert cached is first and new_version == version + 1
+    assert recovered == "✅ All 2 services are UP."
+    assert history.startswith(f"📈 db ({db.key})") and "Last check: UP, 4 ms" in history
+
+def test_rediscovery_diffs_and_auto_enrolls(tmp_path, monkeypatch, monitor_config):
+    TalonMonitor = monitor_config([Target(port=8080, name="node")], discovery_auto_enroll=True, history_enabled=False)
+    import talon_handler.monitor as monitor_module
+    scans = iter([
+        [ListenSocket(8080, "node", pids=[10]), ListenSocket(9000, "old-app", pids=[11])],
+        [ListenSocket(8080, "python3", pids=[20]), ListenSocket(6379, "redis-server", pids=[12])],
+        [ListenSocket(8080, "python3", pids=[20]), ListenSocket(6379, "redis-server", pids=[12])],
+    ])
+    monkeypatch.setattr(monitor_module, "discover_listeners", lambda: next(scans))
+
+    async def scenario():
+        monitor = TalonMonitor()
+        sent = []
+        async def notify(message):
+            sent.append(message)
+        monitor.notify = notify
+        diffs = [await monitor.rediscover()]
+        # A `talon add` lands after the monitor's last reload
+        cli = ConfigManager()
+        cli.update_targets(cli.get_targets() + [Target(port=8443, host="10.0.0.9", name="proxy")])
+        diffs += [await monitor.rediscover() for _ in range(2)]
+        return diffs, sent, monitor
+
+    diffs, sent, monitor = asyncio.run(scenario())
+    baseline, changed, unchanged = diffs
+    assert baseline is None and unchanged is None
+    assert [s.port for s in changed.added] == [6379] and [s.port for s in changed.removed] == [9000]
+    assert [(a.name, b.name) for a, b in changed.rebound] == [("node", "python3")]
+    assert len(sent) == 1 # one notification per diff
+    assert sent[0].splitlines() == [
+        "🔎 Discovery: 1 new, 1 gone, 1 rebound",
+        "➕ redis-server (6379) [enrolled]",
+        "➖ old-app (9000)",
+        "🔁 8080: node (pid 10) → python3 (pid 20)",
+    ]
+    assert Target(port=6379, name="redis-server").key in monitor.targets
+    saved = [t["name"] for t in json.loads((tmp_path / "talon_config.json").read_text())["targets"]]
+    assert saved == ["node", "proxy", "redis-server"]
+
+def test_dependents_of_a_down_parent_are_skipped_and_suppressed(tmp_path, monkeypatch, monitor_config):
+    rack = Target(port=22, host="10.0.0.5", protocol="host", name="rack")
+    apps = [Target(port=port, host="10.0.0.5", name=f"app{port}", parents=["rack"]) for port in (80, 443, 8006)]
+    nested = Target(port=9000, host="10.0.0.5", name="nested", parents=[apps[0].key])
+    local = Target(port=5432, name="db")
+    targets = [rack, *apps, nested, local]
+    TalonMonitor = monitor_config(targets, history_enabled=False)
+
+    async def scenario():
+        monitor = TalonMonitor()
+        state = {"rack_up": False}
+        probed = []
+        async def fake_probe(batch):
+            probed.extend(t.key for t in batch)
+            return {t.key: ProbeResult(up=t.host != "10.0.0.5" or state["rack_up"]) for t in batch}
+        monitor._probe = fake_probe
+        counts = []
+        for _ in range(3):
+            monitor.probe_now()
+            counts.append(await monitor.tick())
+        pending = {kind: dict(p) for kind, p in monitor.alerts.pending.items() if p}
+        outage_probes = list(probed)
+        blocked = monitor.blocked_by(nested.key)
+        status = monitor.snapshot.status()
+        dashboard = (tmp_path / "talon_dashboard.md").read_text()
+        metrics = monitor.metrics.render()
+        rpc_status = json.loads(json.dumps(monitor.status()))
+        state["rack_up"] = True
+        monitor.probe_now([rack.key])
+        recovered = [await monitor.tick(), await monitor.tick()]
+        return counts, outage_probes, pending, blocked, status, dashboard, metrics, rpc_status, recovered, monitor
+
+    counts, probed, pending, blocked, status, dashboard, metrics, rpc_status, recovered, monitor = asyncio.run(scenario())
+    # Probe cost scales with the failed root, not with the services behind it
+    assert counts == [2, 2, 2] and set(probed) == {rack.key, local.key}
+    assert list(pending) == ["root"] and list(pending["root"]) == [rack.key]
+    assert set(pending["root"][rack.key][1].split(", ")) == {"app80", "app443", "app8006", "nested"}
+    # Skipped dependents are reported as suppressed, never as DOWN
+    assert blocked == rack.key and "⏭ nested (10.0.0.5:9000) not probed (rack down)" in status
+    assert "| app80 | 10.0.0.5 | 80 | ⏭ not probed (rack down) |" in dashboard
+    assert f'talon_target_suppressed{{target="{nested.key}"' in metrics
+    assert f'talon_target_up{{target="{nested.key}"' not in metrics
+    import talon_handler.control as control
+    monkeypatch.setattr(control, "request", lambda cmd, **args: rpc_status)
+    cli = CliRunner().invoke(app, ["status"], env={"COLUMNS": "200"})
+    assert cli.exit_code == 0 and cli.output.count("⏭ not probed (rack down)") == 4
+    # The parent's recovery cancels the pending alert and makes its dependents due at once
+    assert recovered == [1, 4] and not any(monitor.alerts.pending.values())
+    assert all(monitor.latest[t.key].up for t in targets) and not monitor.suppressed
+
+HEAVY_MODULES = ("telegram", "httpx", "psutil", "asyncio")
+
+@pytest.mark.parametrize("args", [["--version"], ["code"], ["stop"], ["telegram"]])
+def test_light_commands_skip_heavy_imports(args, tmp_path):
+    """Import budget: lightweight commands must not load the bot, HTTP or discovery stacks."""
+    script = (
+        "import sys\n"
+        "from typer.testing import CliRunner\n"
+        "from talon_handler.main import app\n"
+        f"assert CliRunner().invoke(app, {args!r}).exit_code == 0\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
+
+def test_headstart_saves_discovered_targets(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    import talon_handler.discovery as discovery
+    scan = [ListenSocket(22, "sshd", pids=[1]), ListenSocket(8096, "jellyfin", pids=[2])]
+    monkeypatch.setattr(discovery, "discover_listeners", lambda *args: scan)
+    result = CliRunner().invoke(app, ["headstart"], input="tok\n60\n")
+    assert result.exit_code == 0, result.output
+    saved = json.loads((tmp_path / "talon_config.json").read_text())
+    assert [t["name"] for t in saved["targets"]] == ["sshd", "jellyfin"]
+    assert saved["telegram_token"] == "tok" and len(saved["pending_otp"]) == 6
+
+def test_add_validates_ports(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    runner = CliRunner()
+    assert runner.invoke(app, ["add", "70000"]).exit_code == 1
+    assert runner.invoke(app, ["add"]).exit_code == 1
+    result = runner.invoke(app, ["add", "--protocol", "process", "--query", "dockerd", "--name", "docker"])
+    assert result.exit_code == 0
+    saved = json.loads((tmp_path / "talon_config.json").read_text())["targets"]
+    assert [Target.from_dict(t).key for t in saved] == ["process://127.0.0.1/dockerd"]
+
 def test_version_flag():
     """Test that --version flag displays the correct version."""
     runner = CliRunner()